@@ -1,12 +1,27 @@
 ﻿import re
 import os
 import struct
+import mmap
+import threading
+import contextlib
 import pyzstd
 import sys
 import csv
 import configparser
 import random
-from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QTextEdit, QVBoxLayout, QHBoxLayout, QFileDialog, QLabel, QGroupBox, QGridLayout, QMessageBox, QComboBox
+import time
+import json
+import hashlib
+import shutil
+import tempfile
+import bisect
+from array import array
+from collections import namedtuple, deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from functools import partial
+from multiprocessing import freeze_support
+from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QTextEdit, QVBoxLayout, QHBoxLayout, QFileDialog, QLabel, QGroupBox, QGridLayout, QMessageBox, QComboBox, QCheckBox
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 
@@ -20,15 +35,34 @@ LANG_UI = {
         "group_pack_texts": "📦 Pack text",
         "group_translate": "📑 Translation by ID",
         "group_full_extract": "📦 Full extract (file → data + text)",
+        "group_batch_extract": "📦 Batch extract (game folder → all archives)",
+        "btn_select_game_folder": "📂 Game folder",
+        "btn_batch_run": "Extract all archives",
+        "group_tools": "🛠 Archive tools",
+        "btn_select_archive": "📄 Archive",
+        "btn_select_new_archive": "📄 New archive version",
+        "btn_diff_run": "Compare versions",
+        "btn_verify_run": "Verify archive",
+        "btn_catalog_run": "Build block catalog",
+        "btn_store_run": "Extract into block store (output folder)",
+        "btn_roundtrip_run": "Check repack (extract → pack → extract)",
         "btn_select_file": "📄 Select file",
         "btn_select_folder": "📂 Select folder",
         "btn_output_folder": "📂 Output folder",
         "btn_run_extract_file": "Extract",
         "btn_run_pack_file": "Pack",
+        "chk_text_only": "Text tables only",
+        "chk_blob": "Into a single .blob file",
+        "btn_select_blob": "📄 Select .blob",
+        "btn_select_reference": "📄 Original archive (optional)",
+        "label_pack_preset": "Compression:",
         "btn_full_output_folder": "📂 Output folder (data and text will be created)",
         "btn_full_run": "Extract file and text",
+        "chk_no_dat": "Text only (do not save .dat)",
         "btn_extract_texts_run": "Extract",
+        "btn_id_index_run": "Build ID index (ids.idx)",
         "btn_pack_text_run": "Pack",
+        "btn_pack_text_archive_run": "Pack straight into game archive",
         "btn_tr_select_file": "📄 Select TextExtractor.csv",
         "label_tr_format": "Translation file format",
         "btn_tr_export": "Create CSV/TSV: ID,OriginalText",
@@ -43,15 +77,34 @@ LANG_UI = {
         "group_pack_texts": "📦 Запаковка текста",
         "group_translate": "📑 Перевод по ID",
         "group_full_extract": "📦 Полная распаковка (файл → data + text)",
+        "group_batch_extract": "📦 Пакетная распаковка (папка игры → все архивы)",
+        "btn_select_game_folder": "📂 Папка игры",
+        "btn_batch_run": "Распаковать все архивы",
+        "group_tools": "🛠 Инструменты архива",
+        "btn_select_archive": "📄 Архив",
+        "btn_select_new_archive": "📄 Новая версия архива",
+        "btn_diff_run": "Сравнить версии",
+        "btn_verify_run": "Проверить архив",
+        "btn_catalog_run": "Построить каталог блоков",
+        "btn_store_run": "Распаковать в хранилище блоков (папка сохранения)",
+        "btn_roundtrip_run": "Проверить пересборку (распаковка → сборка → распаковка)",
         "btn_select_file": "📄 Выберите файл",
         "btn_select_folder": "📂 Выберите папку",
         "btn_output_folder": "📂 Папка сохранения",
         "btn_run_extract_file": "Распаковать",
         "btn_run_pack_file": "Запаковать",
+        "chk_text_only": "Только текстовые таблицы",
+        "chk_blob": "В один файл .blob",
+        "btn_select_blob": "📄 Выберите .blob",
+        "btn_select_reference": "📄 Исходный архив (необязательно)",
+        "label_pack_preset": "Сжатие:",
         "btn_full_output_folder": "📂 Папка сохранения (будут созданы data и text)",
         "btn_full_run": "Распаковать файл и текст",
+        "chk_no_dat": "Только текст (не сохранять .dat)",
         "btn_extract_texts_run": "Распаковать",
+        "btn_id_index_run": "Построить индекс ID (ids.idx)",
         "btn_pack_text_run": "Запаковать",
+        "btn_pack_text_archive_run": "Запаковать сразу в архив игры",
         "btn_tr_select_file": "📄 Выберите TextExtractor.csv",
         "label_tr_format": "Формат файла перевода",
         "btn_tr_export": "Создать CSV/TSV: ID,OriginalText",
@@ -60,269 +113,2058 @@ LANG_UI = {
     },
 }
 
-def extract_file(input_file, output_dir, log_callback):
-    try:
-        base_name = os.path.splitext(os.path.basename(input_file))[0]
+# Сигнатура игрового архива и заголовок блока: тип сжатия, размер сжатых данных, размер после распаковки
+ARCHIVE_MAGIC = b'\xEF\xBE\xAD\xDE'
+BLOCK_HEADER = struct.Struct('<BII')
+# Сигнатура текстовой таблицы и её смещение внутри распакованного блока
+TEXT_MAGIC = b'\xDC\x96\x58\x59'
+MAGIC_OFFSET = 16
+# Сколько сжатых байт за раз подаётся в zstd при чтении начала блока
+PEEK_CHUNK = 4096
+# Размер порции по умолчанию для потоковой распаковки больших блоков
+STREAM_CHUNK = 1 << 20
+# Манифест распаковки рядом с .dat: {base_name}.manifest.json
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+# Единый контейнер вместо папки .dat: данные в .blob, смещения в .blob.idx
+BLOB_SUFFIX = '.blob'
+BLOB_INDEX_SUFFIX = '.idx'
+# Хранилище блоков по хэшу содержимого: objects/, манифесты версий в manifests/
+STORE_OBJECTS_DIR = 'objects'
+STORE_MANIFESTS_DIR = 'manifests'
+STORE_COMPRESSED_INDEX = 'compressed.idx'
+# Кэш сжатых блоков для pak_file: предел размера на диске
+PACK_CACHE_MAX = 2 << 30
+# Пресеты сжатия pak_file: default — как раньше (байт в байт с оригинальной сборкой, кроме
+# архива из одного блока при workers > 1 — он сжимается многопоточным zstd),
+# fast — быстрые тестовые сборки, release — минимальный размер для релиза.
+PACK_PRESETS = {
+    'default': {},
+    'fast': {pyzstd.CParameter.compressionLevel: 1},
+    'release': {pyzstd.CParameter.compressionLevel: 19,
+                pyzstd.CParameter.windowLog: 27,
+                pyzstd.CParameter.enableLongDistanceMatching: 1},
+}
+# Окно и long distance matching имеют смысл только для крупных блоков
+PACK_LONG_MIN_SIZE = 1 << 20
+# Автоподбор: сколько байт сэмплировать и какие уровни пробовать
+AUTOTUNE_SAMPLE = 4 << 20
+AUTOTUNE_LEVELS = (1, 3, 6, 9, 13, 16, 19)
+AUTOTUNE_TARGET_SECONDS = 30
+# Число потоков по умолчанию для GUI
+DEFAULT_WORKERS = os.cpu_count() or 1
+# На Windows ProcessPoolExecutor не принимает больше 61 процесса
+MAX_PROCESS_WORKERS = 61 if sys.platform == 'win32' else None
+
+
+def _read_archive_toc(f):
+    """
+    Читает заголовок 0xDEADBEEF и таблицу смещений, не трогая сами блоки.
+    Возвращает (single, [(index, offset, start, length), ...]) или None, если это не архив.
+    single — архив из одного блока (offset_count == 1), где вместо таблицы записана длина блока.
+    """
+    f.seek(0)
+    if f.read(4) != ARCHIVE_MAGIC:
+        return None
 
-        with open(input_file, 'rb') as f:
-            if f.read(4) != b'\xEF\xBE\xAD\xDE':
-                return False
+    f.read(4)
+    offset_count = struct.unpack('<I', f.read(4))[0] + 1
+
+    if offset_count == 1:
+        comp_block_len = struct.unpack('<I', f.read(4))[0]
+        return True, [(0, 0, f.tell(), comp_block_len)]
 
-            f.read(4)
-            offset_count_bytes = f.read(4)
-            offset_count = struct.unpack('<I', offset_count_bytes)[0] + 1
+    offsets = struct.unpack(f'<{offset_count}I', f.read(4 * offset_count))
+    data_start = f.tell()
+    entries = []
+    for i in range(offset_count - 1):
+        entries.append((i, offsets[i], data_start + offsets[i], offsets[i + 1] - offsets[i]))
+    return False, entries
 
-            if offset_count == 1:
-                comp_block_len = struct.unpack('<I', f.read(4))[0]
-                comp_block = f.read(comp_block_len)
 
-                if len(comp_block) < comp_block_len:
-                    return False
+def _read_block(src, start, length, lock=None):
+    """
+    Возвращает блок архива: срез memoryview поверх mmap (без копирования) или bytes из файла.
+    lock — блокировка seek/read, когда файл читают несколько потоков.
+    """
+    if isinstance(src, memoryview):
+        return src[start:start + length]
+    with lock or contextlib.nullcontext():
+        src.seek(start)
+        return memoryview(src.read(length))
 
-                header = comp_block[:9]
-                comp_data_part = comp_block[9:]
 
-                if len(header) < 9:
-                    return False
-                    
-                comp_type, comp_size, decomp_size = struct.unpack('<BII', header)
+def _stream_decompress(payload, out_size, in_size=PEEK_CHUNK):
+    """
+    Потоково распаковывает zstd-кадр из payload, отдавая куски не больше out_size байт.
+    Сжатые данные подаются порциями по in_size, поэтому в памяти не бывает всего блока целиком.
+    """
+    decompressor = pyzstd.ZstdDecompressor()
+    pos = 0
+    while not decompressor.eof:
+        if decompressor.needs_input:
+            if pos >= len(payload):
+                raise ValueError("Неполный zstd-кадр")
+            chunk = payload[pos:pos + in_size]
+            pos += in_size
+        else:
+            chunk = b''
+        data = decompressor.decompress(chunk, out_size)
+        if data:
+            yield data
 
-                if comp_type == 0x04:
-                    try:
-                        decomp_data = pyzstd.decompress(comp_data_part)
-                        output_path = os.path.join(output_subdir, f"{base_name}_0.dat")
-                        with open(output_path, 'wb') as out_f:
-                            out_f.write(decomp_data)
-                        log_callback(f"{base_name}_0.dat {comp_block_len} {decomp_size}")
-                    except Exception:
-                        pass
+
+# Запись оглавления архива: индекс блока, смещение в таблице и поля заголовка <BII
+BlockInfo = namedtuple('BlockInfo', ['index', 'offset', 'comp_type', 'comp_size', 'decomp_size'])
+
+
+class ArchiveReader:
+    """
+    Произвольный доступ к блокам игрового архива 0xDEADBEEF.
+    При открытии читается только таблица смещений и заголовки блоков (toc),
+    распаковка происходит лишь в read_block / iter_blocks.
+    Обрезанные и слишком короткие блоки в toc не попадают, а перечисляются в broken
+    как (index, offset, причина).
+    """
+
+    def __init__(self, input_file, use_mmap=True):
+        self.path = input_file
+        self._f = open(input_file, 'rb')
+        self._mm = None
+        self._lock = threading.Lock()
+        try:
+            stat = os.fstat(self._f.fileno())
+            self.file_size = stat.st_size
+            self.mtime = stat.st_mtime_ns
+            toc = _read_archive_toc(self._f)
+            if toc is None:
+                raise ValueError(f"Файл не является архивом игры: {input_file}")
+            self.single, entries = toc
+
+            if use_mmap:
+                self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._src = memoryview(self._mm)
             else:
-                offsets = [struct.unpack('<I', f.read(4))[0] for _ in range(offset_count)]
-                data_start = f.tell()
-                for i in range(offset_count):
-                    current_offset = offsets[i]
-                    if i == (offset_count - 1):
-                       continue
-                    else:
-                        next_offset = offsets[i + 1]
-                    block_len = next_offset - current_offset
+                self._src = self._f
+
+            self.toc = []
+            self.broken = []
+            self._spans = {}
+            for i, offset, start, length in entries:
+                if length < BLOCK_HEADER.size:
+                    self.broken.append((i, offset, f"блок короче заголовка: {length} байт"))
+                    continue
+                if start + length > self.file_size:
+                    self.broken.append((i, offset, f"блок обрезан: нужно {length} байт, есть {max(self.file_size - start, 0)}"))
+                    continue
+                with _read_block(self._src, start, BLOCK_HEADER.size, self._lock) as header:
+                    comp_type, comp_size, decomp_size = BLOCK_HEADER.unpack(header)
+                self._spans[i] = (len(self.toc), start, length)
+                self.toc.append(BlockInfo(i, offset, comp_type, comp_size, decomp_size))
+        except Exception:
+            self.close()
+            raise
 
-                    f.seek(data_start + current_offset)
-                    comp_block = f.read(block_len)
+    def __len__(self):
+        return len(self.toc)
 
-                    if len(comp_block) < block_len:
-                        continue
+    def __enter__(self):
+        return self
 
-                    if len(comp_block) < 9:
-                        continue
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._mm is not None:
+            self._src.release()
+            try:
+                self._mm.close()
+            except BufferError:
+                # Снаружи ещё живы срезы raw_block — mmap закроется вместе с ними
+                pass
+            self._mm = None
+        self._f.close()
+
+    def _span(self, i):
+        if i not in self._spans:
+            raise IndexError(f"Блок {i} отсутствует в архиве {self.path}")
+        return self._spans[i]
+
+    def info(self, i):
+        """Запись оглавления для блока с индексом i."""
+        return self.toc[self._span(i)[0]]
+
+    def raw_block(self, i):
+        """Сжатый блок i целиком (заголовок <BII + данные) как memoryview, без копирования при mmap."""
+        pos, start, length = self._span(i)
+        return _read_block(self._src, start, length, self._lock)
+
+    def read_block(self, i):
+        """Распаковывает и возвращает содержимое блока i."""
+        with self.raw_block(i) as comp_block:
+            comp_type = comp_block[0]
+            if comp_type != 0x04:
+                raise ValueError(f"Блок {i}: неподдерживаемый тип сжатия {comp_type}")
+            return pyzstd.decompress(comp_block[BLOCK_HEADER.size:])
+
+    def peek_block(self, i, size=MAGIC_OFFSET + 4):
+        """
+        Распаковывает только первые size байт блока i потоковым zstd,
+        подавая сжатые данные небольшими порциями.
+        """
+        head = b''
+        with self.raw_block(i) as comp_block:
+            if comp_block[0] != 0x04:
+                return head
+            for data in _stream_decompress(comp_block[BLOCK_HEADER.size:], size):
+                head += data
+                if len(head) >= size:
+                    break
+        return head[:size]
+
+    def stream_block(self, i, out_f, chunk_size=STREAM_CHUNK):
+        """
+        Распаковывает блок i прямо в файл out_f порциями по chunk_size байт
+        и сверяет итоговый размер с decomp_size из заголовка.
+        """
+        info = self.info(i)
+        if info.comp_type != 0x04:
+            raise ValueError(f"Блок {i}: неподдерживаемый тип сжатия {info.comp_type}")
+        written = 0
+        with self.raw_block(i) as comp_block:
+            for data in _stream_decompress(comp_block[BLOCK_HEADER.size:], chunk_size, chunk_size):
+                out_f.write(data)
+                written += len(data)
+        if written != info.decomp_size:
+            raise ValueError(f"Блок {i}: распаковано {written} байт вместо {info.decomp_size}")
+        return written
+
+    def iter_blocks(self, indices=None):
+        """Отдаёт (index, data) для указанных индексов (по умолчанию — для всех блоков по порядку)."""
+        if indices is None:
+            indices = [info.index for info in self.toc]
+        for i in indices:
+            yield i, self.read_block(i)
+
+
+def _block_digest(reader, i):
+    """Быстрый хэш сжатых байт блока i (вместе с заголовком <BII)."""
+    with reader.raw_block(i) as comp_block:
+        return hashlib.blake2b(comp_block, digest_size=16).hexdigest()
+
+
+class ExtractManifest:
+    """
+    Манифест распаковки архива: размер и mtime архива плюс отпечатки блоков
+    (поля заголовка <BII и хэш сжатых байт) вместе с размером и mtime записанного .dat.
+    Блок с прежним отпечатком, чей .dat лежит в папке нетронутым, повторно не распаковывается.
+    Если размер и mtime архива не изменились, блоки даже не хэшируются.
+    """
+
+    def __init__(self, output_dir, base_name, reader):
+        self.path = os.path.join(output_dir, f"{base_name}{MANIFEST_SUFFIX}")
+        self._reader = reader
+        self._lock = threading.Lock()
+        old = {}
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    old = json.load(f)
+            except Exception:
+                old = {}
+        if old.get('version') != MANIFEST_VERSION:
+            old = {}
+        self._old_blocks = old.get('blocks', {})
+        self._same_archive = old.get('size') == reader.file_size and old.get('mtime') == reader.mtime
+        self._current = {}
+        self.blocks = {}
+        self.skipped = 0
+
+    def fingerprint(self, info):
+        key = str(info.index)
+        if self._same_archive and key in self._old_blocks:
+            return self._old_blocks[key][0]
+        digest = _block_digest(self._reader, info.index)
+        return f"{info.comp_type}:{info.comp_size}:{info.decomp_size}:{digest}"
+
+    def unchanged(self, info, output_path):
+        """Проверяет, совпадает ли отпечаток блока с прошлым запуском и не менялся ли его .dat."""
+        key = str(info.index)
+        fingerprint = self.fingerprint(info)
+        with self._lock:
+            self._current[key] = fingerprint
+        old = self._old_blocks.get(key)
+        if old is None or old[0] != fingerprint or not os.path.isfile(output_path):
+            return False
+        # .dat могли перезаписать руками или через pak_text — тогда распаковываем заново
+        stat = os.stat(output_path)
+        if [stat.st_size, stat.st_mtime_ns] != old[1:]:
+            return False
+        with self._lock:
+            self.blocks[key] = old
+            self.skipped += 1
+        return True
+
+    def record(self, info, output_path):
+        """Отмечает, что .dat блока записан заново."""
+        key = str(info.index)
+        stat = os.stat(output_path)
+        with self._lock:
+            self.blocks[key] = [self._current[key], stat.st_size, stat.st_mtime_ns]
+
+    def save(self):
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'archive': os.path.basename(self._reader.path),
+            'size': self._reader.file_size,
+            'mtime': self._reader.mtime,
+            'blocks': dict(sorted(self.blocks.items(), key=lambda item: int(item[0]))),
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.path)
+
+
+def extract_number(filename):
+    """Номер блока из имени {base_name}_{i}.dat — по нему упорядочиваются блоки при сборке."""
+    match = re.search(r'(\d+)\.dat$', filename)
+    return int(match.group(1)) if match else float('inf')
+
+
+class BlobWriter:
+    """
+    Дописывает распакованные блоки в один файл .blob, а имя, смещение и размер каждого —
+    строкой в соседний индекс .blob.idx. Файлы только дописываются: при повторной записи
+    того же имени действует последняя строка индекса.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        mode = 'ab' if append else 'wb'
+        self._f = open(path, mode)
+        self._index = open(path + BLOB_INDEX_SUFFIX, mode[0], encoding='utf-8', newline='')
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, name, data):
+        with self._lock:
+            self._f.seek(0, os.SEEK_END)
+            offset = self._f.tell()
+            self._f.write(data)
+            self._index.write(f"{name}\t{offset}\t{len(data)}\n")
+
+    def close(self):
+        self._f.close()
+        self._index.close()
+
+
+class BlobReader:
+    """Чтение контейнера .blob по индексу .blob.idx; имена отдаются в порядке номеров блоков."""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        with open(path + BLOB_INDEX_SUFFIX, 'r', encoding='utf-8', newline='') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) == 3:
+                    self._entries[parts[0]] = (int(parts[1]), int(parts[2]))
+        self._f = open(path, 'rb')
+        self._mm = None
+        if os.fstat(self._f.fileno()).st_size:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def names(self):
+        return sorted(self._entries, key=extract_number)
+
+    def size(self, name):
+        return self._entries[name][1]
 
-                    header = comp_block[:9]
-                    comp_data_part = comp_block[9:]
-                    comp_type, comp_size, decomp_size = struct.unpack('<BII', header)
-                    if comp_type == 0x04:
-                        try:
-                            decomp_data = pyzstd.decompress(comp_data_part)
-                            output_path = os.path.join(output_dir, f"{base_name}_{i}.dat")
-                            with open(output_path, 'wb') as out_f:
-                                out_f.write(decomp_data)
-                            log_callback(f"{os.path.basename(output_path)} {current_offset} {decomp_size}")
-                        except Exception:
-                            pass
+    def read(self, name):
+        offset, size = self._entries[name]
+        return self._mm[offset:offset + size] if size else b''
 
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._f.close()
+
+
+def _extract_block(reader, info, output_path, magics=None, chunk_size=None, tracker=None, blob=None):
+    """
+    Распаковывает один блок в output_path с учётом фильтра сигнатур, потокового режима и манифеста.
+    blob — BlobWriter: блок дописывается в контейнер под именем файла из output_path.
+    Возвращает decomp_size, None, если блок пропущен, или исключение, если распаковать не удалось.
+    """
+    if info.comp_type != 0x04:
+        return None
+    try:
+        if tracker is not None and tracker.unchanged(info, output_path):
+            return None
+        if magics is not None:
+            head = reader.peek_block(info.index)
+            if head[MAGIC_OFFSET:MAGIC_OFFSET + 4] not in magics:
+                return None
+        if blob is not None:
+            blob.add(os.path.basename(output_path), reader.read_block(info.index))
+        elif chunk_size:
+            # Пишем во временный файл: обрезанный блок не должен оставить неполный .dat
+            tmp_path = output_path + '.tmp'
+            try:
+                with open(tmp_path, 'wb') as out_f:
+                    reader.stream_block(info.index, out_f, chunk_size)
+                os.replace(tmp_path, output_path)
+            except Exception:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+                raise
+        else:
+            decomp_data = reader.read_block(info.index)
+            with open(output_path, 'wb') as out_f:
+                out_f.write(decomp_data)
+        if tracker is not None:
+            tracker.record(info, output_path)
+    except Exception as e:
+        return e
+    return info.decomp_size
+
+
+def extract_file(input_file, output_dir, log_callback, use_mmap=True, workers=1, magics=None, chunk_size=None,
+                 manifest=False, blob=False):
+    """
+    Распаковывает игровой архив в набор {base_name}_{i}.dat.
+    use_mmap — отображать архив в память и отдавать zstd срезы memoryview,
+    не копируя сжатые блоки (False — старый вариант через seek/read).
+    workers — число потоков распаковки; файлы пишутся по мере готовности,
+    а сообщения в лог идут по порядку индексов.
+    magics — набор сигнатур (bytes по смещению MAGIC_OFFSET); если задан, целиком
+    распаковываются только блоки с подходящей сигнатурой, например {TEXT_MAGIC}.
+    chunk_size — потоковая распаковка порциями этого размера сразу в файл (память
+    ограничена одной порцией, размер сверяется с decomp_size); None — блок целиком в памяти.
+    manifest — вести {base_name}.manifest.json и распаковывать только изменившиеся блоки.
+    blob — вместо множества .dat писать все блоки в один {base_name}.blob с индексом
+    {base_name}.blob.idx (манифест в этом режиме не ведётся).
+    """
+    try:
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        if magics is not None:
+            magics = frozenset(magics)
+
+        with ArchiveReader(input_file, use_mmap) as reader:
+            # Обрезанный блок в одиночном архиве — ошибка, в обычном его просто пропускаем
+            if reader.single and not len(reader):
+                return False
+            tracker = ExtractManifest(output_dir, base_name, reader) if manifest and not blob else None
+            writer = BlobWriter(os.path.join(output_dir, base_name + BLOB_SUFFIX)) if blob else None
+
+            def work(info):
+                output_path = os.path.join(output_dir, f"{base_name}_{info.index}.dat")
+                return _extract_block(reader, info, output_path, magics, chunk_size, tracker, writer)
+
+            try:
+                if workers > 1:
+                    # zstd отпускает GIL, поэтому потоков достаточно, а mmap остаётся общим
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        failed = _log_in_order(pool.map(work, reader.toc), reader.toc, base_name, log_callback)
+                else:
+                    failed = _log_in_order(map(work, reader.toc), reader.toc, base_name, log_callback)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+            if tracker is not None:
+                tracker.save()
+                log_callback(f"Без изменений пропущено блоков: {tracker.skipped}")
+            if failed:
+                log_callback(f"❌ Не удалось распаковать блоков: {failed}")
+                return False
             return True
 
     except Exception:
         return False
 
-def pak_file(input_file, output_dir, log_callback):
+
+def _log_in_order(results, infos, base_name, log_callback):
+    """Пишет в лог результаты распаковки в порядке индексов блоков. Возвращает число ошибок."""
+    failed = 0
+    for info, decomp_size in zip(infos, results):
+        if isinstance(decomp_size, Exception):
+            failed += 1
+            log_callback(f"❌ {base_name}_{info.index}.dat: {str(decomp_size)}")
+        elif decomp_size is not None:
+            log_callback(f"{base_name}_{info.index}.dat {info.offset} {decomp_size}")
+    return failed
+
+
+def find_archives(install_dir):
+    """Ищет в папке установки (рекурсивно) все файлы, начинающиеся с сигнатуры 0xDEADBEEF."""
+    archives = []
+    for root, dirs, files in os.walk(install_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            try:
+                with open(path, 'rb') as f:
+                    if f.read(4) == ARCHIVE_MAGIC:
+                        archives.append(path)
+            except OSError:
+                continue
+    return archives
+
+
+def extract_install(install_dir, output_dir, log_callback, workers=DEFAULT_WORKERS, magics=None, manifest=False):
+    """
+    Пакетная распаковка всей папки игры: находит все архивы 0xDEADBEEF и раскладывает
+    блоки всех архивов по одному общему пулу потоков, начиная с самых больших.
+    Каждый архив распаковывается в output_dir/<относительный путь вместе с расширением>/,
+    чтобы data.bin и data.pak не попали в одну папку.
+    В лог пишется общий прогресс и скорость.
+    """
+    try:
+        if magics is not None:
+            magics = frozenset(magics)
+        archives = find_archives(install_dir)
+        log_callback(f"▶ Найдено архивов: {len(archives)} в {install_dir}")
+
+        readers = []
+        trackers = []
+        try:
+            tasks = []
+            for path in archives:
+                try:
+                    reader = ArchiveReader(path)
+                except Exception as e:
+                    log_callback(f"❌ Не удалось открыть {path}: {str(e)}")
+                    continue
+                readers.append(reader)
+                # Расширение остаётся в имени папки: пути архивов уникальны, папки тоже
+                rel_path = os.path.relpath(path, install_dir)
+                archive_dir = os.path.join(output_dir, rel_path)
+                os.makedirs(archive_dir, exist_ok=True)
+                base_name = os.path.splitext(os.path.basename(path))[0]
+                tracker = ExtractManifest(archive_dir, base_name, reader) if manifest else None
+                if tracker is not None:
+                    trackers.append(tracker)
+                for info in reader.toc:
+                    output_path = os.path.join(archive_dir, f"{base_name}_{info.index}.dat")
+                    tasks.append((reader, info, output_path, tracker))
+
+            # Крупные блоки первыми, чтобы в конце пул не ждал один длинный блок
+            tasks.sort(key=lambda task: task[1].decomp_size, reverse=True)
+            total = len(tasks)
+            total_bytes = sum(task[1].decomp_size for task in tasks)
+            log_callback(f"   блоков: {total}, объём после распаковки: {total_bytes / 1048576:.1f} МБ")
+
+            done = 0
+            extracted = 0
+            failed = 0
+            done_bytes = 0
+            started = time.monotonic()
+            last_report = started
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                futures = {
+                    pool.submit(_extract_block, reader, info, output_path, magics, None, tracker): output_path
+                    for reader, info, output_path, tracker in tasks
+                }
+                for future in as_completed(futures):
+                    decomp_size = future.result()
+                    done += 1
+                    if isinstance(decomp_size, Exception):
+                        failed += 1
+                        log_callback(f"❌ {futures[future]}: {str(decomp_size)}")
+                    elif decomp_size is not None:
+                        extracted += 1
+                        done_bytes += decomp_size
+                    now = time.monotonic()
+                    if now - last_report >= 1.0 or done == total:
+                        last_report = now
+                        speed = done_bytes / 1048576 / max(now - started, 1e-6)
+                        log_callback(f"   прогресс: {done}/{total} блоков, {done_bytes / 1048576:.1f} МБ, {speed:.1f} МБ/с")
+
+            for tracker in trackers:
+                tracker.save()
+        finally:
+            for reader in readers:
+                reader.close()
+
+        if failed:
+            log_callback(f"❌ Пакетная распаковка завершена с ошибками: не удалось распаковать блоков {failed}, "
+                         f"записано {extracted}")
+            return False
+        log_callback(f"✅ Пакетная распаковка завершена: архивов {len(readers)}, записано блоков {extracted}, "
+                     f"за {time.monotonic() - started:.1f} с")
+        return True
+    except Exception as e:
+        log_callback(f"❌ Ошибка пакетной распаковки: {str(e)}")
+        return False
+
+
+def extract_to_store(input_file, store_dir, log_callback, version=None, workers=DEFAULT_WORKERS):
+    """
+    Распаковывает архив в хранилище блоков BlockStore: каждый блок хранится один раз
+    по хэшу содержимого, а версия архива — это manifests/<version>.tsv со списком хэшей.
+    Блоки, чьи сжатые байты уже встречались в хранилище, не распаковываются вовсе.
+    version — имя версии (по умолчанию имя архива без расширения).
+    """
     try:
-        files = [f for f in os.listdir(input_file) if f.endswith('.dat')]
-    
-        def extract_number(filename):
-            match = re.search(r'(\d+)\.dat$', filename)
-            return int(match.group(1)) if match else float('inf')
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        version = version or base_name
+        with ArchiveReader(input_file) as reader, BlockStore(store_dir) as store:
+            def work(info):
+                if info.comp_type != 0x04:
+                    return None
+                comp_digest = _block_digest(reader, info.index)
+                digest = store.lookup_compressed(comp_digest)
+                if digest is not None:
+                    return info, digest, False
+                digest = store.put(reader.read_block(info.index))
+                store.remember(comp_digest, digest)
+                return info, digest, True
+
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                results = [result for result in pool.map(work, reader.toc) if result is not None]
+
+            rows = [(f"{base_name}_{info.index}.dat", digest, info.decomp_size) for info, digest, _ in results]
+            store.write_manifest(version, rows)
+            unpacked = sum(1 for _, _, fresh in results if fresh)
+            manifest_path = store.manifest_path(version)
+
+        log_callback(f"✅ Версия {version} сохранена в хранилище: {manifest_path} "
+                     f"(блоков {len(rows)}, распаковано {unpacked}, взято из хранилища {len(rows) - unpacked})")
+        return True
+    except Exception as e:
+        log_callback(f"❌ Ошибка распаковки в хранилище: {str(e)}")
+        return False
+
+
+def diff_archives(old_file, new_file, log_callback, output_dir=None, workers=DEFAULT_WORKERS):
+    """
+    Сравнивает две версии одного архива по таблице смещений и хэшам сжатых блоков.
+    Возвращает {'added': [...], 'removed': [...], 'changed': [...]} со списками индексов
+    или None при ошибке. Если задан output_dir, туда пишется отчёт diff_<архив>.tsv
+    и распаковываются только добавленные и изменённые блоки новой версии.
+    """
+    try:
+        with ArchiveReader(old_file) as old_reader, ArchiveReader(new_file) as new_reader:
+            old_infos = {info.index: info for info in old_reader.toc}
+            new_infos = {info.index: info for info in new_reader.toc}
+            added = sorted(set(new_infos) - set(old_infos))
+            removed = sorted(set(old_infos) - set(new_infos))
+
+            def is_changed(i):
+                old_info, new_info = old_infos[i], new_infos[i]
+                # Разные поля заголовка — блок точно изменился, хэшировать не нужно
+                if old_info[2:] != new_info[2:]:
+                    return True
+                return _block_digest(old_reader, i) != _block_digest(new_reader, i)
+
+            common = sorted(set(old_infos) & set(new_infos))
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                changed = [i for i, flag in zip(common, pool.map(is_changed, common)) if flag]
+
+            rows = []
+            for status, indices in (('added', added), ('removed', removed), ('changed', changed)):
+                for i in indices:
+                    rows.append([status, i,
+                                 old_infos[i].decomp_size if i in old_infos else '',
+                                 new_infos[i].decomp_size if i in new_infos else ''])
+
+            log_callback(f"▶ Сравнение: {old_file} → {new_file}")
+            for status, i, old_size, new_size in rows:
+                log_callback(f"   {status} {i} {old_size} {new_size}")
+
+            if output_dir:
+                base_name = os.path.splitext(os.path.basename(new_file))[0]
+                report_path = os.path.join(output_dir, f"diff_{base_name}.tsv")
+                with open(report_path, 'w', newline='', encoding='utf-8') as out_f:
+                    writer = csv.writer(out_f, delimiter='\t')
+                    writer.writerow(['Status', 'Index', 'OldSize', 'NewSize'])
+                    writer.writerows(rows)
+
+                to_extract = sorted(added + changed)
+                with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                    results = pool.map(
+                        lambda i: _extract_block(new_reader, new_infos[i],
+                                                 os.path.join(output_dir, f"{base_name}_{i}.dat")),
+                        to_extract)
+                    extracted = 0
+                    for i, decomp_size in zip(to_extract, results):
+                        if isinstance(decomp_size, Exception):
+                            log_callback(f"❌ {base_name}_{i}.dat: {str(decomp_size)}")
+                        elif decomp_size is not None:
+                            extracted += 1
+                log_callback(f"   отчёт: {report_path}, распаковано блоков: {extracted}")
+
+        log_callback(f"✅ Сравнение завершено: добавлено {len(added)}, удалено {len(removed)}, изменено {len(changed)}")
+        return {'added': added, 'removed': removed, 'changed': changed}
+    except Exception as e:
+        log_callback(f"❌ Ошибка сравнения архивов: {str(e)}")
+        return None
+
+
+def _verify_block(reader, info, chunk_size=STREAM_CHUNK):
+    """
+    Проверяет один блок: длину по таблице смещений против comp_size из заголовка
+    и потоковую распаковку против decomp_size. Возвращает (статус, хэш распакованных данных).
+    """
+    if info.comp_type != 0x04:
+        return f"неподдерживаемый тип сжатия {info.comp_type}", ''
+    digest = hashlib.blake2b(digest_size=16)
+    written = 0
+    try:
+        with reader.raw_block(info.index) as comp_block:
+            if len(comp_block) - BLOCK_HEADER.size != info.comp_size:
+                return f"comp_size {info.comp_size}, а в таблице смещений {len(comp_block) - BLOCK_HEADER.size}", ''
+            for data in _stream_decompress(comp_block[BLOCK_HEADER.size:], chunk_size, chunk_size):
+                digest.update(data)
+                written += len(data)
+    except Exception as e:
+        return f"ошибка распаковки: {str(e)}", ''
+    if written != info.decomp_size:
+        return f"распаковано {written} байт вместо {info.decomp_size}", ''
+    return 'ok', digest.hexdigest()
+
+
+def verify_archive(input_file, log_callback, output_dir=None, workers=DEFAULT_WORKERS):
+    """
+    Проверка целостности архива без записи .dat: ищет обрезанные блоки, параллельно
+    распаковывает каждый блок в памяти порциями, сверяет размеры с заголовком
+    и выводит хэш распакованных данных по каждому блоку. Если задан output_dir,
+    отчёт дополнительно сохраняется в verify_<архив>.tsv. Возвращает True, если ошибок нет.
+    """
+    try:
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        with ArchiveReader(input_file) as reader:
+            log_callback(f"▶ Проверка архива: {input_file} (блоков: {len(reader) + len(reader.broken)})")
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                results = list(pool.map(lambda info: _verify_block(reader, info), reader.toc))
+
+            rows = [[i, offset, '', '', reason, ''] for i, offset, reason in reader.broken]
+            for info, (status, digest) in zip(reader.toc, results):
+                rows.append([info.index, info.offset, info.comp_size, info.decomp_size, status, digest])
+            rows.sort(key=lambda row: row[0])
+
+        errors = 0
+        for i, offset, comp_size, decomp_size, status, digest in rows:
+            if status == 'ok':
+                log_callback(f"{base_name}_{i}.dat {offset} {decomp_size} {digest}")
+            else:
+                errors += 1
+                log_callback(f"❌ {base_name}_{i}.dat {offset}: {status}")
+
+        if output_dir:
+            report_path = os.path.join(output_dir, f"verify_{base_name}.tsv")
+            with open(report_path, 'w', newline='', encoding='utf-8') as out_f:
+                writer = csv.writer(out_f, delimiter='\t')
+                writer.writerow(['Index', 'Offset', 'CompSize', 'DecompSize', 'Status', 'Hash'])
+                writer.writerows(rows)
+            log_callback(f"   отчёт: {report_path}")
+
+        if errors:
+            log_callback(f"❌ Проверка завершена: ошибок {errors} из {len(rows)} блоков")
+            return False
+        log_callback(f"✅ Проверка завершена: все {len(rows)} блоков в порядке")
+        return True
+    except Exception as e:
+        log_callback(f"❌ Ошибка проверки архива: {str(e)}")
+        return False
+
+
+# Строка каталога блоков архива (catalog_<архив>.tsv)
+CatalogEntry = namedtuple('CatalogEntry', ['index', 'offset', 'comp_size', 'decomp_size', 'ratio', 'kind',
+                                           'magic', 'head', 'count_full', 'count_text'])
+CATALOG_HEADER = ['Index', 'Offset', 'CompSize', 'DecompSize', 'Ratio', 'Kind', 'Magic', 'Head', 'CountFull', 'CountText']
+
+
+def _catalog_entry(reader, info):
+    """Описывает блок по первым байтам: сигнатура, степень сжатия, счётчики текстовой таблицы."""
+    head = reader.peek_block(info.index) if info.comp_type == 0x04 else b''
+    magic = head[MAGIC_OFFSET:MAGIC_OFFSET + 4]
+    ratio = round(info.decomp_size / info.comp_size, 3) if info.comp_size else 0
+    if magic == TEXT_MAGIC:
+        count_full = struct.unpack_from('<I', head, 0)[0]
+        count_text = struct.unpack_from('<I', head, 8)[0]
+        kind = 'text'
+    else:
+        count_full = count_text = ''
+        kind = 'other' if info.comp_type == 0x04 else f'type{info.comp_type}'
+    return CatalogEntry(info.index, info.offset, info.comp_size, info.decomp_size, ratio, kind,
+                        magic.hex(), head.hex(), count_full, count_text)
+
+
+def build_catalog(input_file, output_dir, log_callback, workers=DEFAULT_WORKERS):
+    """
+    Строит каталог блоков архива в output_dir/catalog_<архив>.tsv: для каждого блока —
+    размеры, степень сжатия, первые байты, сигнатура (text для DC965859, иначе other)
+    и count_full/count_text текстовых таблиц. Распаковывается только начало блоков.
+    """
+    try:
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        with ArchiveReader(input_file) as reader:
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                entries = list(pool.map(lambda info: _catalog_entry(reader, info), reader.toc))
+
+        output_path = os.path.join(output_dir, f"catalog_{base_name}.tsv")
+        with open(output_path, 'w', newline='', encoding='utf-8') as out_f:
+            writer = csv.writer(out_f, delimiter='\t')
+            writer.writerow(CATALOG_HEADER)
+            writer.writerows(entries)
+
+        kinds = {}
+        for entry in entries:
+            kinds[entry.kind] = kinds.get(entry.kind, 0) + 1
+        summary = ", ".join(f"{kind}: {count}" for kind, count in sorted(kinds.items()))
+        log_callback(f"✅ Каталог сохранён: {output_path} ({summary})")
+        return True
+    except Exception as e:
+        log_callback(f"❌ Ошибка построения каталога: {str(e)}")
+        return False
+
+
+def load_catalog(catalog_path, kind=None):
+    """Читает catalog_<архив>.tsv; kind — оставить только блоки этого вида (например 'text')."""
+    int_fields = ('index', 'offset', 'comp_size', 'decomp_size', 'count_full', 'count_text')
+    entries = []
+    with open(catalog_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter='\t')
+        next(reader, None)
+        for row in reader:
+            entry = CatalogEntry(*row)
+            if kind is not None and entry.kind != kind:
+                continue
+            values = {name: int(getattr(entry, name)) for name in int_fields if getattr(entry, name) != ''}
+            entries.append(entry._replace(ratio=float(entry.ratio), **values))
+    return entries
+
+
+class DatFolder:
+    """Папка с .dat как источник блоков — тот же интерфейс, что у BlobReader."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def names(self):
+        files = [f for f in os.listdir(self.path) if f.endswith('.dat')]
         files.sort(key=extract_number)
-    
-        output_file = os.path.join(output_dir, "output_file_for_game.bin")
-        with open(output_file, 'wb') as outfile:
-            outfile.write(b'\xEF\xBE\xAD\xDE\x01\x00\x00\x00')
-            count_files = struct.pack('<I', len(files))
-            outfile.write(count_files)
-            archive = b''
+        return files
+
+    def size(self, name):
+        return os.path.getsize(os.path.join(self.path, name))
+
+    def read(self, name):
+        with open(os.path.join(self.path, name), 'rb') as infile:
+            return infile.read()
+
+    def close(self):
+        pass
+
+
+class BlockStore:
+    """
+    Хранилище распакованных блоков по хэшу содержимого, общее для нескольких версий игры.
+    objects/<xx>/<хэш> — содержимое блока (одинаковые блоки лежат один раз),
+    compressed.idx — соответствие хэша сжатого блока хэшу содержимого, чтобы уже
+    известные блоки не распаковывать повторно, manifests/<версия>.tsv — состав версии.
+    """
+
+    def __init__(self, store_dir):
+        self.path = store_dir
+        os.makedirs(os.path.join(store_dir, STORE_OBJECTS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(store_dir, STORE_MANIFESTS_DIR), exist_ok=True)
+        self._lock = threading.Lock()
+        self._compressed = {}
+        index_path = os.path.join(store_dir, STORE_COMPRESSED_INDEX)
+        if os.path.isfile(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2:
+                        self._compressed[parts[0]] = parts[1]
+        self._index = open(index_path, 'a', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def object_path(self, digest):
+        return os.path.join(self.path, STORE_OBJECTS_DIR, digest[:2], digest)
+
+    def put(self, data):
+        """Кладёт содержимое блока в хранилище (если его там ещё нет) и возвращает его хэш."""
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as out_f:
+                out_f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def lookup_compressed(self, comp_digest):
+        """Хэш содержимого для уже встречавшегося сжатого блока или None."""
+        digest = self._compressed.get(comp_digest)
+        if digest is not None and os.path.isfile(self.object_path(digest)):
+            return digest
+        return None
+
+    def remember(self, comp_digest, digest):
+        with self._lock:
+            if self._compressed.get(comp_digest) != digest:
+                self._compressed[comp_digest] = digest
+                self._index.write(f"{comp_digest} {digest}\n")
+
+    def manifest_path(self, version):
+        return os.path.join(self.path, STORE_MANIFESTS_DIR, f"{version}.tsv")
+
+    def write_manifest(self, version, rows):
+        """rows — [(имя .dat, хэш содержимого, размер), ...]."""
+        with open(self.manifest_path(version), 'w', newline='', encoding='utf-8') as out_f:
+            writer = csv.writer(out_f, delimiter='\t')
+            writer.writerow(['Name', 'Hash', 'Size'])
+            writer.writerows(rows)
+
+    def close(self):
+        self._index.close()
+
+
+class StoreVersion:
+    """Версия архива из BlockStore (manifests/<версия>.tsv) как источник .dat — интерфейс как у DatFolder."""
+
+    def __init__(self, manifest_path):
+        self.path = manifest_path
+        self._store_dir = os.path.dirname(os.path.dirname(os.path.abspath(manifest_path)))
+        self._entries = {}
+        with open(manifest_path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f, delimiter='\t')
+            next(reader, None)
+            for name, digest, size in reader:
+                self._entries[name] = (digest, int(size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def names(self):
+        return sorted(self._entries, key=extract_number)
+
+    def size(self, name):
+        return self._entries[name][1]
+
+    def read(self, name):
+        digest = self._entries[name][0]
+        with open(os.path.join(self._store_dir, STORE_OBJECTS_DIR, digest[:2], digest), 'rb') as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+
+class ArchiveSource:
+    """
+    Архив игры как источник .dat (интерфейс как у DatFolder): блоки распаковываются
+    в память по запросу, на диск ничего не пишется. Имена — <архив>_<номер>.dat, как у extract_file.
+    """
+
+    def __init__(self, input_file):
+        self.path = input_file
+        self._reader = ArchiveReader(input_file)
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        self._entries = {f"{base_name}_{info.index}.dat": info
+                         for info in self._reader.toc if info.comp_type == 0x04}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def names(self):
+        return sorted(self._entries, key=extract_number)
+
+    def size(self, name):
+        return self._entries[name].decomp_size
+
+    def read(self, name):
+        return self._reader.read_block(self._entries[name].index)
+
+    def close(self):
+        self._reader.close()
+
+
+def _is_archive(path):
+    with open(path, 'rb') as f:
+        return f.read(4) == ARCHIVE_MAGIC
+
+
+def open_dat_source(path):
+    """Открывает набор .dat: контейнер .blob, версию из хранилища блоков, сам архив игры или обычную папку."""
+    if os.path.isfile(path) and _is_archive(path):
+        return ArchiveSource(path)
+    if os.path.isfile(path) and path.endswith(BLOB_SUFFIX):
+        return BlobReader(path)
+    if os.path.isfile(path) and os.path.basename(os.path.dirname(os.path.abspath(path))) == STORE_MANIFESTS_DIR:
+        return StoreVersion(path)
+    if os.path.isdir(path):
+        return DatFolder(path)
+    raise ValueError(f"Не найдена папка .dat, контейнер .blob, манифест хранилища или архив игры: {path}")
+
+
+class ArchiveWriter:
+    """
+    Потоковая запись архива 0xDEADBEEF: таблица смещений на count + 1 записей
+    резервируется сразу, блоки пишутся на диск по мере поступления, а смещения
+    заполняются в close(). В памяти держится только текущий блок.
+    """
+
+    def __init__(self, path, count):
+        self.path = path
+        self.count = count
+        self._offsets = []
+        self._pos = 0
+        self._f = open(path, 'wb')
+        self._f.write(ARCHIVE_MAGIC + b'\x01\x00\x00\x00')
+        self._f.write(struct.pack('<I', count))
+        self._table_start = self._f.tell()
+        self._f.write(b'\x00' * (4 * (count + 1)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+
+    def add_raw(self, block):
+        """Дописывает готовый блок (заголовок <BII + сжатые данные)."""
+        self._offsets.append(self._pos)
+        self._f.write(block)
+        self._pos += len(block)
+
+    def add(self, comp_data, decomp_size):
+        """Дописывает сжатые zstd-данные с заголовком <BII."""
+        self._offsets.append(self._pos)
+        self._f.write(BLOCK_HEADER.pack(4, len(comp_data), decomp_size))
+        self._f.write(comp_data)
+        self._pos += BLOCK_HEADER.size + len(comp_data)
+
+    def close(self):
+        if self._f.closed:
+            return
+        if len(self._offsets) != self.count:
+            self._f.close()
+            raise ValueError(f"Записано блоков {len(self._offsets)} из {self.count}")
+        self._f.seek(self._table_start)
+        self._f.write(struct.pack(f'<{self.count + 1}I', *self._offsets, self._pos))
+        self._f.close()
+
+
+def _ordered_map(pool, func, items, window):
+    """
+    Как pool.map, но держит в работе не больше window задач: результаты отдаются
+    по порядку, а память ограничена несколькими блоками.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class CompressCache:
+    """
+    Дисковый кэш сжатых блоков между сборками. Ключ — хэш несжатых данных
+    вместе с параметрами сжатия, значение — сжатые zstd-данные.
+    Попадание обновляет mtime файла, а evict() удаляет самые давние записи,
+    пока кэш не уложится в max_size байт.
+    """
+
+    def __init__(self, cache_dir, max_size=PACK_CACHE_MAX):
+        self.path = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(data, options=None):
+        digest = hashlib.blake2b(data, digest_size=20)
+        digest.update(repr(sorted((int(k), v) for k, v in (options or {}).items())).encode('ascii'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + '.zst')
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                comp_data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return comp_data
+
+    def put(self, key, comp_data):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(comp_data)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Удаляет самые давно использованные записи сверх max_size. Возвращает число удалённых."""
+        entries = []
+        total = 0
+        for root, dirs, files in os.walk(self.path):
             for filename in files:
-                file_path = os.path.join(input_file, filename)
-                file_size = os.path.getsize(file_path)
-                with open(file_path, 'rb') as infile:
-                    comp_data = pyzstd.compress(infile.read())
-                    header = struct.pack('<BII', 4, len(comp_data), file_size)
-                    len_arch = struct.pack('<I', len(archive))
-                    outfile.write(len_arch)
-                    archive += header + comp_data
-                log_callback(f"Обработан: {filename}")
-                
-            len_arch = struct.pack('<I', len(archive))
-            outfile.write(len_arch)
-            outfile.write(archive)
-    
+                if not filename.endswith('.zst'):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def _preset_options(preset, size):
+    """
+    Параметры zstd для блока размером size по пресету (словарь из PACK_PRESETS
+    или имя). Для мелких блоков большое окно и LDM отбрасываются.
+    """
+    options = dict(PACK_PRESETS[preset] if isinstance(preset, str) else preset)
+    if size < PACK_LONG_MIN_SIZE:
+        options.pop(pyzstd.CParameter.windowLog, None)
+        options.pop(pyzstd.CParameter.enableLongDistanceMatching, None)
+    return options
+
+
+def _compress_block(data, preset='default', cache=None, threads=1):
+    """
+    Сжимает содержимое блока по пресету, сверяясь с CompressCache (если задан).
+    threads > 1 включает встроенную многопоточность zstd для одного большого блока.
+    Многопоточный zstd режет данные на задания, и результат отличается от однопоточного
+    (остаётся корректным для игры). Число потоков в ключ кэша не входит: сжатие
+    того же блока с тем же пресетом переиспользуется при любом числе ядер.
+    """
+    options = _preset_options(preset, len(data))
+    if cache is not None:
+        key = cache.key(data, options)
+    if threads > 1 and pyzstd.zstd_support_multithread:
+        options[pyzstd.CParameter.nbWorkers] = threads
+    options = options or None
+    if cache is not None:
+        comp_data = cache.get(key)
+        if comp_data is not None:
+            return comp_data
+    comp_data = pyzstd.compress(data, options)
+    if cache is not None:
+        cache.put(key, comp_data)
+    return comp_data
+
+
+def _autotune_preset(source, files, workers, log_callback, target_seconds=None, target_size=None):
+    """
+    Подбирает уровень zstd по выборке блоков, равномерно взятых из files.
+    Для каждого уровня из AUTOTUNE_LEVELS оценивает время сборки (с учётом workers)
+    и итоговый размер и пишет таблицу в лог. При target_size берётся самый быстрый
+    уровень, укладывающийся в размер, иначе — самый сильный, укладывающийся
+    в target_seconds. Возвращает словарь параметров для _preset_options.
+    """
+    total = sum(source.size(f) for f in files)
+    # Сколько файлов помещается в выборку — и через сколько брать каждый, чтобы пройти весь список
+    fits = max(1, len(files) * AUTOTUNE_SAMPLE // max(total, 1))
+    step = max(1, len(files) // fits)
+    sample = []
+    sampled = 0
+    for filename in files[::step]:
+        # Запас на разброс размеров файлов; обрыв лишь страхует от очень крупных блоков
+        if sampled >= 2 * AUTOTUNE_SAMPLE:
+            break
+        data = source.read(filename)
+        sample.append(data)
+        sampled += len(data)
+    if not sampled:
+        return dict(PACK_PRESETS['default'])
+
+    scale = total / sampled
+    estimates = []
+    for level in AUTOTUNE_LEVELS:
+        options = {pyzstd.CParameter.compressionLevel: level}
+        start = time.perf_counter()
+        size = sum(len(pyzstd.compress(data, options)) for data in sample)
+        seconds = (time.perf_counter() - start) * scale / max(workers, 1)
+        estimates.append((level, seconds, int(size * scale)))
+        log_callback(f"Автоподбор: уровень {level} — ~{seconds:.1f} с, ~{int(size * scale)} байт")
+
+    if target_size is not None:
+        fitting = [e for e in estimates if e[2] <= target_size]
+        level = min(fitting, key=lambda e: e[1])[0] if fitting else estimates[-1][0]
+    else:
+        limit = AUTOTUNE_TARGET_SECONDS if target_seconds is None else target_seconds
+        fitting = [e for e in estimates if e[1] <= limit]
+        level = min(fitting, key=lambda e: e[2])[0] if fitting else estimates[0][0]
+    log_callback(f"Автоподбор: выбран уровень {level}")
+    return {pyzstd.CParameter.compressionLevel: level}
+
+
+def _unchanged_by_manifest(input_file, reference):
+    """
+    Номера блоков, чьи .dat в папке input_file не менялись с распаковки reference:
+    манифест {архив}.manifest.json относится к этому же архиву, а размер и mtime .dat совпадают.
+    """
+    base_name = os.path.splitext(os.path.basename(reference.path))[0]
+    manifest_path = os.path.join(input_file, f"{base_name}{MANIFEST_SUFFIX}")
+    if not os.path.isdir(input_file) or not os.path.isfile(manifest_path):
+        return set()
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except Exception:
+        return set()
+    if manifest.get('version') != MANIFEST_VERSION or \
+            manifest.get('size') != reference.file_size or manifest.get('mtime') != reference.mtime:
+        return set()
+    unchanged = set()
+    for key, (fingerprint, size, mtime) in manifest.get('blocks', {}).items():
+        path = os.path.join(input_file, f"{base_name}_{key}.dat")
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if stat.st_size == size and stat.st_mtime_ns == mtime:
+            unchanged.add(int(key))
+    return unchanged
+
+
+def pak_file(input_file, output_dir, log_callback, workers=1, reference=None, cache_dir=None,
+             cache_max=PACK_CACHE_MAX, preset='default', target_seconds=None, target_size=None):
+    """
+    Собирает архив игры из папки .dat или из контейнера .blob (input_file).
+    Блоки сжимаются и сразу пишутся на диск через ArchiveWriter.
+    workers — число потоков сжатия; порядок блоков (extract_number) и заголовки <BII
+    не меняются. Единственный блок сжимается встроенной многопоточностью zstd — такой
+    архив корректен, но не совпадает байт в байт с однопоточной сборкой (для этого workers=1).
+    reference — исходный архив игры: если .dat совпадает с блоком того же номера,
+    сжатый блок вместе с заголовком копируется из него без пересжатия.
+    cache_dir — папка CompressCache: сжимаются только блоки, которых ещё нет в кэше;
+    после сборки кэш ужимается до cache_max байт.
+    preset — имя из PACK_PRESETS или 'auto': уровень подбирается _autotune_preset
+    под target_seconds (время сборки) или target_size (размер архива в байтах).
+    """
+    ref_reader = None
+    try:
+        cache = CompressCache(cache_dir, cache_max) if cache_dir else None
+        if reference:
+            ref_reader = ArchiveReader(reference)
+            unchanged = _unchanged_by_manifest(input_file, ref_reader)
+
+        with open_dat_source(input_file) as source:
+            files = source.names()
+            started = time.perf_counter()
+            if preset == 'auto':
+                preset = _autotune_preset(source, files, workers, log_callback, target_seconds, target_size)
+
+            def original_block(filename):
+                """Сжатый блок из reference, если .dat не изменился, иначе None."""
+                index = extract_number(filename)
+                try:
+                    info = ref_reader.info(index)
+                except IndexError:
+                    return None
+                if info.comp_type != 0x04 or info.decomp_size != source.size(filename):
+                    return None
+                if index in unchanged or ref_reader.read_block(index) == source.read(filename):
+                    return ref_reader.raw_block(index)
+                return None
+
+            def compress(filename):
+                if ref_reader is not None:
+                    block = original_block(filename)
+                    if block is not None:
+                        return filename, block, None
+                file_data = source.read(filename)
+                comp_data = _compress_block(file_data, preset, cache, workers if len(files) == 1 else 1)
+                return filename, comp_data, len(file_data)
+
+            copied = 0
+            output_file = os.path.join(output_dir, "output_file_for_game.bin")
+            with ArchiveWriter(output_file, len(files)) as archive, \
+                 ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                for filename, comp_data, file_size in _ordered_map(pool, compress, files, max(workers, 1) * 2):
+                    if file_size is None:
+                        archive.add_raw(comp_data)
+                        copied += 1
+                        continue
+                    archive.add(comp_data, file_size)
+                    log_callback(f"Обработан: {filename}")
+            if ref_reader is not None:
+                log_callback(f"Скопировано без пересжатия: {copied} из {len(files)}")
+            if cache is not None:
+                removed = cache.evict()
+                log_callback(f"Кэш сжатия: попаданий {cache.hits}, сжато заново {cache.misses}, удалено старых записей {removed}")
+            total = sum(source.size(f) for f in files)
+            packed = os.path.getsize(output_file)
+            log_callback(f"Время сборки: {time.perf_counter() - started:.1f} с, "
+                         f"размер: {packed} из {total} байт ({packed / max(total, 1):.1%})")
+
         log_callback(f"✅ Сборка завершена. Файл сохранен как: {output_file}")
     except Exception as e:
         log_callback(f"❌ Ошибка сборки файла: {str(e)}")
+    finally:
+        if ref_reader is not None:
+            ref_reader.close()
+
+def _first_difference(reader_a, reader_b, i):
+    """Смещение первого различающегося байта в распакованном блоке i двух архивов."""
+    data_a = reader_a.read_block(i)
+    data_b = reader_b.read_block(i)
+    for pos in range(0, max(len(data_a), len(data_b)), STREAM_CHUNK):
+        chunk_a = data_a[pos:pos + STREAM_CHUNK]
+        chunk_b = data_b[pos:pos + STREAM_CHUNK]
+        if chunk_a != chunk_b:
+            for k in range(min(len(chunk_a), len(chunk_b))):
+                if chunk_a[k] != chunk_b[k]:
+                    return pos + k
+            return pos + min(len(chunk_a), len(chunk_b))
+    return None
+
+
+def roundtrip_archive(input_file, log_callback, output_dir=None, workers=DEFAULT_WORKERS, preset='default'):
+    """
+    Проверка цепочки распаковка → сборка → распаковка без .dat на диске.
+    Архив пересобирается pak_file прямо из блоков исходного архива (ArchiveSource)
+    во временный файл в output_dir (или рядом с архивом), затем оба архива
+    параллельно распаковываются потоково и сравниваются хэши блоков.
+    Сообщает первый расходящийся блок и смещение байта. Возвращает True, если всё совпало.
+    """
+    tmp_dir = None
+    try:
+        tmp_dir = tempfile.mkdtemp(prefix='roundtrip_', dir=output_dir or os.path.dirname(os.path.abspath(input_file)))
+        log_callback(f"▶ Проверка пересборки: {input_file}")
+
+        messages = []
+        pak_file(input_file, tmp_dir, messages.append, workers=workers, preset=preset)
+        errors = [m for m in messages if m.startswith('❌')]
+        if errors:
+            for message in errors:
+                log_callback(message)
+            return False
+        repacked_file = os.path.join(tmp_dir, "output_file_for_game.bin")
+
+        with ArchiveReader(input_file) as original, ArchiveReader(repacked_file) as repacked:
+            for i, offset, reason in original.broken:
+                log_callback(f"❌ Исходный блок {i} повреждён: {reason}")
+            if original.broken:
+                return False
+            for i, offset, reason in repacked.broken:
+                log_callback(f"❌ Пересобранный блок {i} повреждён: {reason}")
+            if repacked.broken:
+                return False
+            if len(original) != len(repacked):
+                log_callback(f"❌ Число блоков: в исходном {len(original) + len(original.broken)}, "
+                             f"после пересборки {len(repacked)}")
+                return False
+
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                results_a = pool.map(lambda info: _verify_block(original, info), original.toc)
+                results_b = pool.map(lambda info: _verify_block(repacked, info), repacked.toc)
+                for info, (status_a, digest_a), (status_b, digest_b) in zip(original.toc, results_a, results_b):
+                    if status_a != 'ok' or status_b != 'ok':
+                        log_callback(f"❌ Блок {info.index}: в исходном {status_a}, после пересборки {status_b}")
+                        return False
+                    if digest_a != digest_b:
+                        pos = _first_difference(original, repacked, info.index)
+                        log_callback(f"❌ Блок {info.index} отличается, первый различающийся байт: {pos}")
+                        return False
+
+            log_callback(f"Размер: исходный {original.file_size}, пересобранный {repacked.file_size} байт")
+        log_callback(f"✅ Пересборка совпадает с исходным архивом: {len(original)} блоков")
+        return True
+    except Exception as e:
+        log_callback(f"❌ Ошибка проверки пересборки: {str(e)}")
+        return False
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# Заголовок TextExtractor.csv
+TEXT_CSV_HEADER = ['Number','File','All Blocks','Work Blocks','Current Block','Unknown','ID','OriginalText']
+# Запись индекса текстовой таблицы: ID, смещение текста от поля смещения, длина текста
+TEXT_INDEX = struct.Struct('<8sII')
+# Кэш разобранных таблиц extract_text: заголовок (сигнатура, count_full, count_text, число записей)
+# и записи (Unknown в hex, ID, длина текста) + текст в UTF-8; всё вместе сжато zstd
+TEXT_CACHE_MAGIC = b'WTC1'
+TEXT_CACHE_HEADER = struct.Struct('<4sIII')
+TEXT_CACHE_RECORD = struct.Struct('<2s8sI')
+
+
+def _parse_text_table(data):
+    """
+    Разбирает текстовую таблицу (блок с TEXT_MAGIC) из памяти: bytes, mmap или memoryview.
+    Вся таблица индексов декодируется одним struct.iter_unpack, тексты режутся срезами без копирования.
+    Возвращает (count_full, count_text, records), где records — [(Current Block, Unknown, ID, OriginalText), ...].
+    """
+    view = memoryview(data)
+    try:
+        count_full = struct.unpack_from('<I', view, 0)[0]
+        count_text = struct.unpack_from('<I', view, 8)[0]
+        code = view[24:24 + count_full].hex()
+        data_start = 24 + count_full + 17
+        index = view[data_start:data_start + count_full * TEXT_INDEX.size]
+        records = []
+        pos = data_start + 8
+        for i, (id, offset_text, lenght) in enumerate(TEXT_INDEX.iter_unpack(index)):
+            text_start = pos + offset_text
+            text = str(view[text_start:text_start + lenght], 'utf-8', 'ignore')
+            text = text.replace('\n', '\\n')
+            text = text.replace('\r', '\\r')
+            records.append((str(i), code[i*2:(i+1)*2], id.hex(), text))
+            pos += TEXT_INDEX.size
+        return count_full, count_text, records
+    finally:
+        view.release()
+
+
+def _write_text_tables(output_path, tables, log_callback):
+    """
+    Пишет TextExtractor.csv из разобранных таблиц.
+    tables — итератор (file_name, count_full, count_text, records), где records — из _parse_text_table.
+    """
+    with open(output_path, 'w', newline='', encoding="utf-8") as out_f:
+        writer = csv.writer(out_f, delimiter=';')
+        writer.writerow(TEXT_CSV_HEADER)
+        k = 0
+        for file_name, count_full, count_text, records in tables:
+            for record in records:
+                k += 1
+                writer.writerow([str(k), file_name, count_full, count_text, *record])
+            log_callback(f"Обработан - {os.path.splitext(file_name)[0]}.txt - {count_text}")
+
+
+def _source_text_tables(source):
+    """Текстовые таблицы из источника open_dat_source (.blob, манифест хранилища, архив) в порядке номеров блоков."""
+    for name in source.names():
+        data = source.read(name)
+        if data[MAGIC_OFFSET:MAGIC_OFFSET + 4] == TEXT_MAGIC:
+            yield (name, *_parse_text_table(data))
+
+
+class TextTable(Mapping):
+    """
+    Текстовая таблица .dat (TEXT_MAGIC) как словарь ID → текст без чтения всего файла.
+    Файл отображается в память; при обращении разбирается только индекс, а строка
+    декодируется лишь та, что запрошена. ID — hex-строка, как в колонке ID TextExtractor.csv.
+    source — путь к .dat или уже прочитанные данные (bytes, memoryview, например блок из .blob).
+    Тексты возвращаются как есть, без экранирования \\n и \\r, которое делается для CSV.
+    """
+
+    def __init__(self, source):
+        self.path = source if isinstance(source, str) else None
+        self._f = None
+        self._mm = None
+        self._view = None
+        if self.path is not None:
+            self._f = open(source, 'rb')
+            try:
+                self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Пустой файл нельзя отобразить в память
+                self.close()
+                raise ValueError(f"Не текстовая таблица: {self.path}")
+            source = self._mm
+        self._view = memoryview(source)
+        if bytes(self._view[MAGIC_OFFSET:MAGIC_OFFSET + 4]) != TEXT_MAGIC:
+            self.close()
+            raise ValueError(f"Не текстовая таблица: {self.path or 'данные в памяти'}")
+        self.count_full = struct.unpack_from('<I', self._view, 0)[0]
+        self.count_text = struct.unpack_from('<I', self._view, 8)[0]
+        self._data_start = 24 + self.count_full + 17
+        self._ids = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _index(self):
+        """ID → номер записи; строится по таблице индексов при первом поиске (первая запись с ID побеждает)."""
+        if self._ids is None:
+            ids = {}
+            for i, id in enumerate(self.raw_ids()):
+                ids.setdefault(id.hex(), i)
+            self._ids = ids
+        return self._ids
+
+    def raw_ids(self):
+        """8-байтовые ID всех записей в порядке записей (с повторами)."""
+        index = self._view[self._data_start:self._data_start + self.count_full * TEXT_INDEX.size]
+        try:
+            return [id for id, offset_text, lenght in TEXT_INDEX.iter_unpack(index)]
+        finally:
+            index.release()
+
+    def record_id(self, i):
+        """ID записи i (hex)."""
+        return TEXT_INDEX.unpack_from(self._view, self._record_pos(i))[0].hex()
+
+    def unknown(self, i):
+        """Байт Unknown записи i."""
+        if not 0 <= i < self.count_full:
+            raise IndexError(i)
+        return self._view[24 + i]
+
+    def text(self, i):
+        """Текст записи i."""
+        pos = self._record_pos(i)
+        id, offset_text, lenght = TEXT_INDEX.unpack_from(self._view, pos)
+        text_start = pos + 8 + offset_text
+        return str(self._view[text_start:text_start + lenght], 'utf-8', 'ignore')
+
+    def _record_pos(self, i):
+        if not 0 <= i < self.count_full:
+            raise IndexError(i)
+        return self._data_start + i * TEXT_INDEX.size
+
+    def __getitem__(self, id):
+        return self.text(self._index()[id])
+
+    def __contains__(self, id):
+        return id in self._index()
+
+    def __iter__(self):
+        return iter(self._index())
+
+    def __len__(self):
+        return len(self._index())
+
+
+# Глобальный индекс ID (ids.idx): заголовок (сигнатура, версия, число файлов, число записей),
+# имена .dat (u16 длина + UTF-8), затем с выравниванием на 8 байт отсортированный массив ID uint64
+# и параллельный ему массив (номер файла, номер записи)
+ID_INDEX_NAME = 'ids.idx'
+ID_INDEX_MAGIC = b'WIDX'
+ID_INDEX_VERSION = 1
+ID_INDEX_HEADER = struct.Struct('<4sIII')
+ID_INDEX_REF = struct.Struct('<II')
+
+
+def _id_to_int(id):
+    """ID как uint64: hex-строка из CSV или 8 байт из .dat. Порядок чисел совпадает с порядком hex-строк."""
+    if isinstance(id, int):
+        return id
+    if isinstance(id, str):
+        return int(id, 16)
+    return int.from_bytes(id, 'big')
+
+
+def build_id_index(input_path, output_dir, log_callback):
+    """
+    Строит по папке .dat (или .blob / манифесту хранилища) глобальный индекс ID
+    всех текстовых таблиц: отсортированный массив uint64 с (файл, номер записи)
+    в output_dir/ids.idx. Читать его — через IdIndex.
+    """
+    try:
+        names = []
+        entries = []
+        with open_dat_source(input_path) as source:
+            for name in source.names():
+                try:
+                    if isinstance(source, DatFolder):
+                        table = TextTable(os.path.join(input_path, name))
+                    else:
+                        table = TextTable(source.read(name))
+                except ValueError:
+                    continue
+                with table:
+                    file_no = len(names)
+                    names.append(name)
+                    entries.extend((_id_to_int(id), file_no, i) for i, id in enumerate(table.raw_ids()))
+        entries.sort()
+
+        ids = array('Q', (e[0] for e in entries))
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        output_path = os.path.join(output_dir, ID_INDEX_NAME)
+        with open(output_path, 'wb') as out_f:
+            out_f.write(ID_INDEX_HEADER.pack(ID_INDEX_MAGIC, ID_INDEX_VERSION, len(names), len(entries)))
+            for name in names:
+                encoded = name.encode('utf-8')
+                out_f.write(struct.pack('<H', len(encoded)) + encoded)
+            out_f.write(b'\0' * (-out_f.tell() % 8))
+            out_f.write(ids.tobytes())
+            for id, file_no, i in entries:
+                out_f.write(ID_INDEX_REF.pack(file_no, i))
+        log_callback(f"✅ Индекс ID построен: {len(entries)} записей из {len(names)} таблиц, файл: {output_path}")
+        return True
+    except Exception as e:
+        log_callback(f"❌ Ошибка построения индекса ID: {str(e)}")
+        return False
+
+
+class IdIndex:
+    """
+    Чтение ids.idx из build_id_index: массив ID отображается в память и ищется
+    двоичным поиском. ID можно передавать hex-строкой (как в CSV) или числом.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, 'rb')
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, file_count, count = ID_INDEX_HEADER.unpack_from(self._mm, 0)
+        if magic != ID_INDEX_MAGIC or version != ID_INDEX_VERSION:
+            self.close()
+            raise ValueError(f"Неподдерживаемый индекс ID: {path}")
+        pos = ID_INDEX_HEADER.size
+        self.files = []
+        for _ in range(file_count):
+            length = struct.unpack_from('<H', self._mm, pos)[0]
+            self.files.append(self._mm[pos + 2:pos + 2 + length].decode('utf-8'))
+            pos += 2 + length
+        pos += -pos % 8
+        self._count = count
+        if sys.byteorder == 'little':
+            self._ids = memoryview(self._mm)[pos:pos + count * 8].cast('Q')
+        else:
+            self._ids = array('Q', self._mm[pos:pos + count * 8])
+            self._ids.byteswap()
+        self._refs_start = pos + count * 8
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if isinstance(getattr(self, '_ids', None), memoryview):
+            self._ids.release()
+        self._ids = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._f.close()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, id):
+        key = _id_to_int(id)
+        pos = bisect.bisect_left(self._ids, key)
+        return pos < self._count and self._ids[pos] == key
+
+    def lookup(self, id):
+        """Все вхождения ID: [(имя .dat, номер записи), ...] (пусто, если ID нет)."""
+        key = _id_to_int(id)
+        pos = bisect.bisect_left(self._ids, key)
+        result = []
+        while pos < self._count and self._ids[pos] == key:
+            file_no, i = ID_INDEX_REF.unpack_from(self._mm, self._refs_start + pos * ID_INDEX_REF.size)
+            result.append((self.files[file_no], i))
+            pos += 1
+        return result
+
+    def _present(self, ids):
+        """
+        Для каждого ID из ids — есть ли он в индексе (в исходном порядке).
+        Запрос переводится в числа и сортируется один раз, затем проходится одним
+        слиянием с массивом индекса: bisect продолжает поиск с позиции предыдущего ID.
+        """
+        keys = [_id_to_int(id) for id in ids]
+        found = set()
+        lo = 0
+        for key in sorted(set(keys)):
+            lo = bisect.bisect_left(self._ids, key, lo)
+            if lo == self._count:
+                break
+            if self._ids[lo] == key:
+                found.add(key)
+        return [key in found for key in keys]
+
+    def existing(self, ids):
+        """Те ID из ids, которые есть в индексе (в исходном порядке)."""
+        ids = list(ids)
+        return [id for id, present in zip(ids, self._present(ids)) if present]
+
+    def missing(self, ids):
+        """Те ID из ids, которых нет в индексе (в исходном порядке)."""
+        ids = list(ids)
+        return [id for id, present in zip(ids, self._present(ids)) if not present]
+
+
+def _dump_text_table(table):
+    """Упаковывает результат _parse_text_table в компактный двоичный вид для кэша."""
+    count_full, count_text, records = table
+    parts = [TEXT_CACHE_HEADER.pack(TEXT_CACHE_MAGIC, count_full, count_text, len(records))]
+    for i, unk, id, text in records:
+        text = text.encode('utf-8')
+        parts.append(TEXT_CACHE_RECORD.pack(unk.encode('ascii'), bytes.fromhex(id), len(text)))
+        parts.append(text)
+    return pyzstd.compress(b''.join(parts))
+
+
+def _load_text_table(data):
+    """Обратное к _dump_text_table."""
+    data = pyzstd.decompress(data)
+    magic, count_full, count_text, count = TEXT_CACHE_HEADER.unpack_from(data, 0)
+    if magic != TEXT_CACHE_MAGIC:
+        raise ValueError("неверная сигнатура кэша текста")
+    pos = TEXT_CACHE_HEADER.size
+    records = []
+    for i in range(count):
+        unk, id, lenght = TEXT_CACHE_RECORD.unpack_from(data, pos)
+        pos += TEXT_CACHE_RECORD.size
+        records.append((str(i), unk.rstrip(b'\0').decode('ascii'), id.hex(), data[pos:pos + lenght].decode('utf-8')))
+        pos += lenght
+    return count_full, count_text, records
+
+
+def _read_text_table(path, cache_dir=None):
+    """
+    Разбирает .dat как текстовую таблицу, отображая файл в память один раз.
+    Возвращает (результат _parse_text_table или None, если это не текстовая таблица; взято ли из кэша).
+    cache_dir — кэш разборов по хэшу содержимого .dat: неизменившиеся таблицы не разбираются заново.
+    """
+    with open(path, 'rb') as f:
+        if f.read(MAGIC_OFFSET + 4)[MAGIC_OFFSET:] != TEXT_MAGIC:
+            return None, False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if not cache_dir:
+                return _parse_text_table(mm), False
+            digest = hashlib.blake2b(mm, digest_size=16).hexdigest()
+            cache_path = os.path.join(cache_dir, digest[:2], digest + '.bin')
+            try:
+                with open(cache_path, 'rb') as cache_f:
+                    return _load_text_table(cache_f.read()), True
+            except Exception:
+                pass
+            table = _parse_text_table(mm)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as cache_f:
+        cache_f.write(_dump_text_table(table))
+    os.replace(tmp_path, cache_path)
+    return table, False
+
 
-def extract_text(input_path, output_dir, log_callback):
+def _folder_text_tables(input_path, workers=1, cache_dir=None, stats=None):
+    """
+    Текстовые таблицы из папки .dat в порядке номеров блоков.
+    При workers > 1 файлы разбираются в пуле процессов, а результаты отдаются
+    в том же порядке, поэтому CSV и нумерация Number не зависят от числа процессов.
+    stats — словарь, в который считаются таблицы из кэша ('cached') и разобранные заново ('parsed').
+    """
+    # Тот же порядок, что у DatFolder/.blob/хранилища: по номеру блока (extract_number), затем по имени
+    files = sorted((f for f in os.listdir(input_path)
+                    if f.endswith('.dat') and os.path.isfile(os.path.join(input_path, f))),
+                   key=lambda f: (extract_number(f), f))
+    paths = [os.path.join(input_path, f) for f in files]
+    read = partial(_read_text_table, cache_dir=cache_dir)
+    if stats is None:
+        stats = {}
+    stats.setdefault('cached', 0)
+    stats.setdefault('parsed', 0)
+    if MAX_PROCESS_WORKERS is not None:
+        workers = min(workers, MAX_PROCESS_WORKERS)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(paths) > 1 else None
+    try:
+        results = _ordered_map(pool, read, paths, workers * 4) if pool is not None else map(read, paths)
+        for filename, (table, cached) in zip(files, results):
+            if table is not None:
+                stats['cached' if cached else 'parsed'] += 1
+                yield (filename, *table)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def extract_text(input_path, output_dir, log_callback, workers=1, cache_dir=None):
+    """
+    Распаковка текстовых таблиц в TextExtractor.csv из папки .dat или из любого
+    другого источника open_dat_source: контейнера .blob, манифеста хранилища, архива игры.
+    workers > 1 — разбор .dat в нескольких процессах; порядок строк всегда по номерам блоков.
+    cache_dir — кэш разобранных таблиц по хэшу содержимого: после патча заново
+    разбираются только новые и изменившиеся .dat.
+    """
     try:
+        output_path = os.path.join(output_dir, "TextExtractor.csv")
         if os.path.isdir(input_path):
-            y = 0
-            k = 0
-            for filename in os.listdir(input_path):
-                if filename.endswith('.dat'):
-                    full_path = os.path.join(input_path, filename)
-                    if os.path.isfile(full_path):
-                        base_name = os.path.splitext(os.path.basename(full_path))[0]
-                        with open(full_path, 'rb') as f:
-                            f.seek(16)
-                            code = b''
-                            if f.read(4) == b'\xDC\x96\x58\x59':
-                                y += 1
-                                if y == 1:
-                                    form = 'w'
-                                else:
-                                    form = 'a'
-                                output_path = os.path.join(output_dir, f"TextExtractor.csv")
-                                file_name = os.path.basename(full_path)
-                                f.seek(0)
-                                count_full = struct.unpack('<I', f.read(4))[0]
-                                f.read(4)
-                                count_text = struct.unpack('<I', f.read(4))[0]
-                                f.read(12)
-                                code = f.read(count_full).hex()
-                                f.read(17)
-                                data_start = f.tell()
-                                with open(output_path, form, newline='', encoding="utf-8") as out_f:
-                                    writer = csv.writer(out_f, delimiter=';')
-                                    if form == 'w':
-                                        writer.writerow(['Number','File','All Blocks','Work Blocks','Current Block','Unknown','ID','OriginalText'])
-                                    for i in range(count_full):
-                                        f.seek(data_start + (i * 16))
-                                        id = f.read(8).hex()
-                                        start_text_offset = f.tell()
-                                        offset_text = struct.unpack('<I', f.read(4))[0]
-                                        lenght = struct.unpack('<I', f.read(4))[0]
-                                        f.seek(start_text_offset + offset_text)
-                                        text = f.read(lenght).decode('utf-8', errors='ignore')
-                                        text = text.replace('\n', '\\n')
-                                        text = text.replace('\r', '\\r')
-                                        k += 1
-                                        writer.writerow([str(k), file_name, count_full, count_text, str(i), code[i*2:(i+1)*2], id, text])
-                                log_callback(f"Обработан - {base_name}.txt - {count_text}")
+            stats = {}
+            _write_text_tables(output_path, _folder_text_tables(input_path, workers, cache_dir, stats), log_callback)
+            if cache_dir:
+                log_callback(f"Кэш текста: из кэша {stats['cached']}, разобрано заново {stats['parsed']}")
+        else:
+            # .blob, манифест хранилища или архив: таблицы разбираются прямо из памяти
+            with open_dat_source(input_path) as source:
+                _write_text_tables(output_path, _source_text_tables(source), log_callback)
         log_callback(f"✅ Распаковка текста завершена в {output_path}")   
         return True
     except Exception as e:
         log_callback(f"❌ Ошибка распаковки: {str(e)}")
         return False
 
+def _iter_text_tables(input_file):
+    """
+    Собирает текстовые таблицы из TextExtractor.csv в памяти.
+    Отдаёт (имя .dat, содержимое) по мере того, как в CSV заканчиваются строки очередного файла.
+    """
+    def build():
+        return b''.join([all_blocks, work_blocks, file_bytes, filled_bytes_unk, filled_bytes_id, filled_bytes_text])
+
+    base_name = ''
+    with open(input_file, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=';')
+        k = 0
+        start_unk = 0
+        start_id = 0
+        curr_text = 0
+        all_blocks = b''
+        work_blocks = b''
+        filled_bytes_unk = b''
+        filled_bytes_id = b''
+        filled_bytes_text = b''
+        for row in reader:
+            if row[0] == "Number" or row[1] == 'File':
+                continue
+                
+            if row[1] != base_name:
+                form = 'wb'
+                if base_name != '':
+                    yield base_name, build()
+                base_name = str(row[1])
+            else:
+                form = 'ab'
+                
+            if form == 'wb':
+                all_blocks = struct.pack('<II', int(row[2]), 0)
+                work_blocks = struct.pack('<II', int(row[3]), 0)
+                file_bytes = b'\xDC\x96\x58\x59\x00\x00\x00\x00'
+                filled_bytes_unk = b''
+                filled_bytes_id = b''
+                filled_bytes_text = b''
+                start_unk = len(all_blocks) + len(work_blocks) + len(file_bytes)
+                start_id = start_unk + int(row[2]) + 17
+                curr_text = start_id + int(row[2]) * 16
+            
+            text = row[7].replace('\\n', '\x0A').encode('utf-8')
+            unk_byte = bytes.fromhex(row[5])
+            filled_bytes_unk += unk_byte
+            start_unk += 1
+            if start_unk >= int(row[2]) + 24:
+                if len(filled_bytes_unk) >= 16:
+                    filled_bytes_unk += b'\xFF' + filled_bytes_unk[:16]
+                else:
+                    filled_bytes_unk += b'\xFF' + filled_bytes_unk + b'\x80' * (16 - len(filled_bytes_unk))
+            id_byte = bytes.fromhex(row[6])
+            filled_bytes_id += id_byte
+            start_id += 8
+            offset_len = struct.pack('<II', (curr_text - start_id), len(text))
+            filled_bytes_id += offset_len
+            start_id += 8
+            filled_bytes_text += text
+            curr_text += len(text)
+        if base_name != '':
+            yield base_name, build()
+
+
 def pak_text(input_file, output_dir, log_callback):
+    """
+    Собирает .dat текстовых таблиц из TextExtractor.csv в папку output_dir.
+    Если output_dir — путь к контейнеру .blob, таблицы дописываются в него
+    (при чтении действует последняя запись каждого имени).
+    """
+    blob = None
     try:
-        base_name = ''
-        with open(input_file, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f, delimiter=';')
-            k = 0
-            start_unk = 0
-            start_id = 0
-            curr_text = 0
-            all_blocks = b''
-            work_blocks = b''
-            filled_bytes_unk = b''
-            filled_bytes_id = b''
-            filled_bytes_text = b''
-            for row in reader:
-                if row[0] == "Number" or row[1] == 'File':
-                    continue
-                    
-                if row[1] != base_name:
-                    form = 'wb'
-                    if base_name != '':
-                        output_path = os.path.join(output_dir, base_name)
-                        with open(output_path, form) as out_f:
-                            out_f.write(all_blocks)
-                            out_f.write(work_blocks)
-                            out_f.write(file_bytes)
-                            out_f.write(filled_bytes_unk)
-                            out_f.write(filled_bytes_id)
-                            out_f.write(filled_bytes_text)
-                    base_name = str(row[1])
-                else:
-                    form = 'ab'
-                    
-                if form == 'wb':
-                    all_blocks = struct.pack('<II', int(row[2]), 0)
-                    work_blocks = struct.pack('<II', int(row[3]), 0)
-                    file_bytes = b'\xDC\x96\x58\x59\x00\x00\x00\x00'
-                    filled_bytes_unk = b''
-                    filled_bytes_id = b''
-                    filled_bytes_text = b''
-                    start_unk = len(all_blocks) + len(work_blocks) + len(file_bytes)
-                    start_id = start_unk + int(row[2]) + 17
-                    curr_text = start_id + int(row[2]) * 16
-                
-                text = row[7].replace('\\n', '\x0A').encode('utf-8')
-                unk_byte = bytes.fromhex(row[5])
-                filled_bytes_unk += unk_byte
-                start_unk += 1
-                if start_unk >= int(row[2]) + 24:
-                    if len(filled_bytes_unk) >= 16:
-                        filled_bytes_unk += b'\xFF' + filled_bytes_unk[:16]
-                    else:
-                        filled_bytes_unk += b'\xFF' + filled_bytes_unk + b'\x80' * (16 - len(filled_bytes_unk))
-                id_byte = bytes.fromhex(row[6])
-                filled_bytes_id += id_byte
-                start_id += 8
-                offset_len = struct.pack('<II', (curr_text - start_id), len(text))
-                filled_bytes_id += offset_len
-                start_id += 8
-                filled_bytes_text += text
-                curr_text += len(text)
-            output_path = os.path.join(output_dir, base_name)
-            with open(output_path, form) as out_f:
-                out_f.write(all_blocks)
-                out_f.write(work_blocks)
-                out_f.write(file_bytes)
-                out_f.write(filled_bytes_unk)
-                out_f.write(filled_bytes_id)
-                out_f.write(filled_bytes_text)
+        if output_dir.endswith(BLOB_SUFFIX):
+            blob = BlobWriter(output_dir, append=True)
+
+        for name, data in _iter_text_tables(input_file):
+            if blob is not None:
+                blob.add(name, data)
+            else:
+                with open(os.path.join(output_dir, name), 'wb') as out_f:
+                    out_f.write(data)
         log_callback(f"✅ Запаковка завершена")            
         return True
 
     except Exception as e:
         log_callback(f"❌ Ошибка запаковки: {str(e)}")
         return False
+    finally:
+        if blob is not None:
+            blob.close()
 
 
-def extract_all(input_file, output_dir, log_callback):
+def build_text_archive(input_file, archive_file, output_dir, log_callback, workers=1, preset='default',
+                       cache_dir=None, csv_name=None):
+    """
+    Сборка архива игры сразу из переведённого TextExtractor.csv и исходного архива,
+    без промежуточной папки .dat: таблицы собираются в памяти (как в pak_text),
+    сжимаются и пишутся в output_file_for_game.bin. Блоки, которых нет в CSV
+    или чьё содержимое не изменилось, копируются из исходного архива без пересжатия.
+    csv_name — имя архива в колонке File CSV (<csv_name>_<номер>.dat), если исходный
+    архив с тех пор переименован; по умолчанию — имя archive_file без расширения.
+    """
+    try:
+        cache = CompressCache(cache_dir) if cache_dir else None
+        with ArchiveReader(archive_file) as original:
+            if original.broken:
+                raise ValueError(f"в исходном архиве повреждено блоков: {len(original.broken)}")
+            # В CSV могут быть таблицы нескольких архивов: берутся только <архив>_<номер>.dat этого
+            base_name = csv_name or os.path.splitext(os.path.basename(archive_file))[0]
+            tables = {}
+            foreign = set()
+            for name, data in _iter_text_tables(input_file):
+                prefix, _, number = os.path.splitext(name)[0].rpartition('_')
+                if prefix != base_name or not number.isdigit() or name != f"{base_name}_{int(number)}.dat":
+                    foreign.add(name)
+                    continue
+                index = int(number)
+                if index in tables:
+                    raise ValueError(f"таблица {name} встречается в CSV несколько раз")
+                tables[index] = data
+            if foreign and not tables:
+                prefixes = sorted({os.path.splitext(name)[0].rpartition('_')[0] for name in foreign})
+                raise ValueError(f"в CSV нет таблиц архива {base_name} (найдены: {', '.join(prefixes[:5])}); "
+                                 f"укажите имя архива из CSV (csv_name) или переименуйте архив")
+            if foreign:
+                log_callback(f"Пропущено таблиц другого архива: {len(foreign)} ({', '.join(sorted(foreign)[:5])})")
+            missing = sorted(set(tables) - {info.index for info in original.toc})
+            if missing:
+                raise ValueError(f"в архиве нет блоков из CSV: {missing[:10]}")
+
+            def build(info):
+                data = tables.get(info.index)
+                if data is None or (info.comp_type == 0x04 and info.decomp_size == len(data)
+                                    and original.read_block(info.index) == data):
+                    return info, None, None
+                return info, _compress_block(data, preset, cache), len(data)
+
+            rebuilt = 0
+            output_file = os.path.join(output_dir, "output_file_for_game.bin")
+            with ArchiveWriter(output_file, len(original)) as archive, \
+                 ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                for info, comp_data, size in _ordered_map(pool, build, original.toc, max(workers, 1) * 2):
+                    if comp_data is None:
+                        archive.add_raw(original.raw_block(info.index))
+                        continue
+                    archive.add(comp_data, size)
+                    rebuilt += 1
+                    log_callback(f"Обработан: {os.path.basename(archive_file)} — блок {info.index}")
+            log_callback(f"Пересобрано таблиц: {rebuilt}, скопировано блоков без изменений: {len(original) - rebuilt}")
+            if cache is not None:
+                cache.evict()
+
+        log_callback(f"✅ Сборка завершена. Файл сохранен как: {output_file}")
+        return True
+    except Exception as e:
+        log_callback(f"❌ Ошибка сборки файла: {str(e)}")
+        return False
+
+
+def extract_all(input_file, output_dir, log_callback, fused=False, write_dat=True, workers=1, manifest=False):
     """
     Обобщённая функция:
     1) распаковывает контейнер в подпапку data (extract_file);
     2) извлекает текст из получившихся .dat в подпапку text (extract_text).
+    fused — совмещённый режим: блоки разбираются в TextExtractor.csv прямо из памяти,
+    без повторного чтения .dat с диска; write_dat=False — .dat не сохраняются вовсе.
+    manifest — распаковывать в data только изменившиеся блоки (см. ExtractManifest).
     """
     try:
         base_name = os.path.splitext(os.path.basename(input_file))[0]
         data_dir = os.path.join(output_dir, "data")
         text_dir = os.path.join(output_dir, "text")
 
-        os.makedirs(data_dir, exist_ok=True)
+        if write_dat or not fused:
+            os.makedirs(data_dir, exist_ok=True)
         os.makedirs(text_dir, exist_ok=True)
 
         log_callback(f"▶ Полная распаковка для: {input_file}")
-        log_callback(f"   data → {data_dir}")
+        if write_dat or not fused:
+            log_callback(f"   data → {data_dir}")
         log_callback(f"   text → {text_dir}")
 
+        if fused:
+            ok = _extract_all_fused(input_file, data_dir if write_dat else None, text_dir, log_callback, workers,
+                                    manifest)
+            if not ok:
+                log_callback("❌ Полная распаковка: ошибка при чтении архива")
+                return False
+            log_callback(f"✅ Полная распаковка завершена. CSV в папке: {text_dir}")
+            return True
+
         # Шаг 1: распаковка файлов
-        ok_files = extract_file(input_file, data_dir, log_callback)
+        ok_files = extract_file(input_file, data_dir, log_callback, workers=workers, manifest=manifest)
         if not ok_files:
             log_callback("❌ Полная распаковка: ошибка на этапе распаковки файлов")
             return False
 
         # Шаг 2: извлечение текста из распакованных .dat
-        ok_text = extract_text(data_dir, text_dir, log_callback)
+        ok_text = extract_text(data_dir, text_dir, log_callback, workers=workers)
         if not ok_text:
             log_callback("❌ Полная распаковка: ошибка на этапе извлечения текста")
             return False
@@ -334,26 +2176,113 @@ def extract_all(input_file, output_dir, log_callback):
         return False
 
 
+def _extract_all_fused(input_file, data_dir, text_dir, log_callback, workers=1, manifest=False):
+    """
+    Совмещённая распаковка: блоки распаковываются, проверяются на TEXT_MAGIC и сразу
+    разбираются в строки TextExtractor.csv. data_dir=None — .dat не пишутся, а блоки
+    без сигнатуры текста даже не распаковываются целиком.
+    manifest — неизменившиеся блоки не распаковываются: текстовые таблицы
+    читаются из уже лежащих в data_dir .dat, остальные пропускаются.
+    """
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    try:
+        reader = ArchiveReader(input_file)
+    except Exception:
+        return False
+
+    with reader:
+        tracker = ExtractManifest(data_dir, base_name, reader) if manifest and data_dir is not None else None
+
+        def work(info):
+            if info.comp_type != 0x04:
+                return None
+            try:
+                if tracker is not None:
+                    output_path = os.path.join(data_dir, f"{base_name}_{info.index}.dat")
+                    if tracker.unchanged(info, output_path):
+                        with open(output_path, 'rb') as f:
+                            f.seek(MAGIC_OFFSET)
+                            if f.read(4) != TEXT_MAGIC:
+                                return None
+                            f.seek(0)
+                            return info, _parse_text_table(f.read()), False
+                if data_dir is None:
+                    head = reader.peek_block(info.index)
+                    if head[MAGIC_OFFSET:MAGIC_OFFSET + 4] != TEXT_MAGIC:
+                        return None
+                data = reader.read_block(info.index)
+                if data_dir is not None:
+                    output_path = os.path.join(data_dir, f"{base_name}_{info.index}.dat")
+                    with open(output_path, 'wb') as out_f:
+                        out_f.write(data)
+                    if tracker is not None:
+                        tracker.record(info, output_path)
+                if data[MAGIC_OFFSET:MAGIC_OFFSET + 4] != TEXT_MAGIC:
+                    return info, None, True
+                return info, _parse_text_table(data), True
+            except Exception:
+                return None
+
+        def tables(results):
+            for result in results:
+                if result is None:
+                    continue
+                info, table, written = result
+                file_name = f"{base_name}_{info.index}.dat"
+                if data_dir is not None and written:
+                    log_callback(f"{file_name} {info.offset} {info.decomp_size}")
+                if table is not None:
+                    yield (file_name, *table)
+
+        output_path = os.path.join(text_dir, "TextExtractor.csv")
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            _write_text_tables(output_path, tables(pool.map(work, reader.toc)), log_callback)
+        if tracker is not None:
+            tracker.save()
+            log_callback(f"Без изменений пропущено блоков: {tracker.skipped}")
+        log_callback(f"✅ Распаковка текста завершена в {output_path}")
+    return True
+
+
 class WorkerThread(QThread):
     log_signal = pyqtSignal(str)
 
-    def __init__(self, input_path, output_dir, func):
+    def __init__(self, input_path, output_dir, func, **kwargs):
         super().__init__()
         self.input_path = input_path
         self.output_dir = output_dir
         self.func = func
+        # Дополнительные параметры для вызываемой функции (потоки, фильтры и т.п.)
+        self.kwargs = kwargs
 
     def run(self):
         if self.func == 1:
-            extract_file(self.input_path, self.output_dir, self.log_signal.emit)
+            extract_file(self.input_path, self.output_dir, self.log_signal.emit, **self.kwargs)
         elif self.func == 2:
-            pak_file(self.input_path, self.output_dir, self.log_signal.emit)
+            pak_file(self.input_path, self.output_dir, self.log_signal.emit, **self.kwargs)
         elif self.func == 3:
-            extract_text(self.input_path, self.output_dir, self.log_signal.emit)
+            extract_text(self.input_path, self.output_dir, self.log_signal.emit, **self.kwargs)
         elif self.func == 4:
             pak_text(self.input_path, self.output_dir, self.log_signal.emit)
         elif self.func == 5:
-            extract_all(self.input_path, self.output_dir, self.log_signal.emit)
+            extract_all(self.input_path, self.output_dir, self.log_signal.emit, **self.kwargs)
+        elif self.func == 6:
+            extract_install(self.input_path, self.output_dir, self.log_signal.emit, **self.kwargs)
+        elif self.func == 7:
+            diff_archives(self.input_path, self.kwargs["new_file"], self.log_signal.emit, self.output_dir)
+        elif self.func == 8:
+            verify_archive(self.input_path, self.log_signal.emit, self.output_dir)
+        elif self.func == 9:
+            build_catalog(self.input_path, self.output_dir, self.log_signal.emit)
+        elif self.func == 10:
+            extract_to_store(self.input_path, self.output_dir, self.log_signal.emit, **self.kwargs)
+        elif self.func == 11:
+            roundtrip_archive(self.input_path, self.log_signal.emit, self.output_dir, **self.kwargs)
+        elif self.func == 12:
+            build_text_archive(self.input_path, output_dir=self.output_dir, log_callback=self.log_signal.emit,
+                               **self.kwargs)
+        elif self.func == 13:
+            build_id_index(self.input_path, self.output_dir, self.log_signal.emit)
 
 class MyApp(QWidget):
     def __init__(self):
@@ -389,9 +2318,11 @@ class MyApp(QWidget):
         # Основной layout в виде сетки 2 колонки:
         # [ Переключатель языка ]          (100%)
         # [ Полная распаковка ]            (100%)
+        # [ Пакетная распаковка ]          (100%)
         # [ Распаковка файла ] [ Распаковка текста ]
         # [ Запаковка текста ] [ Запаковка файла ]
-        # [ Перевод по ID ]                (100%) + лог
+        # [ Перевод по ID ]                (100%)
+        # [ Инструменты архива ]           (100%) + лог
         main_layout = QGridLayout()
         main_layout.setColumnStretch(0, 1)
         main_layout.setColumnStretch(1, 1)
@@ -421,6 +2352,8 @@ class MyApp(QWidget):
         group_box_pack_texts = QGroupBox(self._t("group_pack_texts"))
         group_box_translate = QGroupBox(self._t("group_translate"))
         group_box_full_extract = QGroupBox(self._t("group_full_extract"))
+        group_box_batch_extract = QGroupBox(self._t("group_batch_extract"))
+        group_box_tools = QGroupBox(self._t("group_tools"))
 
         # Создаем QPushButton's в "Распаковка файлов"
         group_layout = QGridLayout()
@@ -442,10 +2375,15 @@ class MyApp(QWidget):
         group_layout.addWidget(buttonEF_output_folder, 1, 0)
         group_layout.addWidget(self.labelEF_output_folder, 1, 1)
 
+        self.checkEF_text_only = QCheckBox(self._t("chk_text_only"))
+        group_layout.addWidget(self.checkEF_text_only, 2, 0)
+        self.checkEF_blob = QCheckBox(self._t("chk_blob"))
+        group_layout.addWidget(self.checkEF_blob, 2, 1)
+
         buttonEF_run = QPushButton(self._t("btn_run_extract_file"))
         buttonEF_run.setStyleSheet("background: #2196F3; color: white; font-weight: bold;")
         buttonEF_run.clicked.connect(self.start_processing1)
-        group_layout.addWidget(buttonEF_run, 2, 0, 1, 0)
+        group_layout.addWidget(buttonEF_run, 3, 0, 1, 0)
         group_box_extr_files.setLayout(group_layout)
 
         # Создаем QPushButton's в "Запаковка файлов"
@@ -460,18 +2398,38 @@ class MyApp(QWidget):
         buttonPF_select_folder.clicked.connect(self.selectPF_input_dir)
         group_layout.addWidget(buttonPF_select_folder, 0, 0)
         group_layout.addWidget(self.labelPF_select_folder, 0, 1)
+
+        buttonPF_select_blob = QPushButton(self._t("btn_select_blob"))
+        buttonPF_select_blob.clicked.connect(self.selectPF_input_blob)
+        group_layout.addWidget(buttonPF_select_blob, 1, 0)
         
         buttonPF_output_folder = QPushButton(self._t("btn_output_folder"))
         self.labelPF_output_folder = QLabel('Папка не выбрана')
         self.labelPF_output_folder.setWordWrap(True)
         buttonPF_output_folder.clicked.connect(self.selectPF_output_dir)
-        group_layout.addWidget(buttonPF_output_folder, 1, 0)
-        group_layout.addWidget(self.labelPF_output_folder, 1, 1)
+        group_layout.addWidget(buttonPF_output_folder, 2, 0)
+        group_layout.addWidget(self.labelPF_output_folder, 2, 1)
+
+        buttonPF_reference = QPushButton(self._t("btn_select_reference"))
+        self.labelPF_reference = QLabel('Файл не выбран')
+        self.labelPF_reference.setWordWrap(True)
+        buttonPF_reference.clicked.connect(self.selectPF_reference_file)
+        group_layout.addWidget(buttonPF_reference, 3, 0)
+        group_layout.addWidget(self.labelPF_reference, 3, 1)
+
+        labelPF_preset = QLabel(self._t("label_pack_preset"))
+        self.comboPF_preset = QComboBox()
+        self.comboPF_preset.addItem("default (как в игре)", "default")
+        self.comboPF_preset.addItem("fast (быстрая сборка)", "fast")
+        self.comboPF_preset.addItem("release (минимальный размер)", "release")
+        self.comboPF_preset.addItem(f"auto (≤ {AUTOTUNE_TARGET_SECONDS} с)", "auto")
+        group_layout.addWidget(labelPF_preset, 4, 0)
+        group_layout.addWidget(self.comboPF_preset, 4, 1)
 
         buttonPF_run = QPushButton(self._t("btn_run_pack_file"))
         buttonPF_run.setStyleSheet("background: #4CAF50; color: white; font-weight: bold;")
         buttonPF_run.clicked.connect(self.start_processing2)
-        group_layout.addWidget(buttonPF_run, 2, 0, 1, 0)
+        group_layout.addWidget(buttonPF_run, 5, 0, 1, 0)
         group_box_pack_files.setLayout(group_layout)
 
         # Создаем QPushButton's в "Полная распаковка (файл → data + text)"
@@ -494,12 +2452,41 @@ class MyApp(QWidget):
         group_layout.addWidget(buttonFE_output_folder, 1, 0)
         group_layout.addWidget(self.labelFE_output_folder, 1, 1)
 
+        self.checkFE_no_dat = QCheckBox(self._t("chk_no_dat"))
+        group_layout.addWidget(self.checkFE_no_dat, 2, 0, 1, 0)
+
         buttonFE_run = QPushButton(self._t("btn_full_run"))
         buttonFE_run.setStyleSheet("background: #9C27B0; color: white; font-weight: bold;")
         buttonFE_run.clicked.connect(self.start_processing5)
-        group_layout.addWidget(buttonFE_run, 2, 0, 1, 0)
+        group_layout.addWidget(buttonFE_run, 3, 0, 1, 0)
         group_box_full_extract.setLayout(group_layout)
 
+        # Создаем QPushButton's в "Пакетная распаковка (папка игры → все архивы)"
+        group_layout = QGridLayout()
+        group_layout.setColumnMinimumWidth(0, 250)
+        group_layout.setColumnStretch(0, 0)
+        group_layout.setColumnStretch(1, 1)
+
+        buttonBE_select_folder = QPushButton(self._t("btn_select_game_folder"))
+        self.labelBE_select_folder = QLabel('Папка не выбрана')
+        self.labelBE_select_folder.setWordWrap(True)
+        buttonBE_select_folder.clicked.connect(self.selectBE_input_dir)
+        group_layout.addWidget(buttonBE_select_folder, 0, 0)
+        group_layout.addWidget(self.labelBE_select_folder, 0, 1)
+
+        buttonBE_output_folder = QPushButton(self._t("btn_output_folder"))
+        self.labelBE_output_folder = QLabel('Папка не выбрана')
+        self.labelBE_output_folder.setWordWrap(True)
+        buttonBE_output_folder.clicked.connect(self.selectBE_output_dir)
+        group_layout.addWidget(buttonBE_output_folder, 1, 0)
+        group_layout.addWidget(self.labelBE_output_folder, 1, 1)
+
+        buttonBE_run = QPushButton(self._t("btn_batch_run"))
+        buttonBE_run.setStyleSheet("background: #9C27B0; color: white; font-weight: bold;")
+        buttonBE_run.clicked.connect(self.start_processing6)
+        group_layout.addWidget(buttonBE_run, 2, 0, 1, 0)
+        group_box_batch_extract.setLayout(group_layout)
+
         # Создаем QPushButton's в "Распаковка текста"
         group_layout = QGridLayout()
         group_layout.setColumnMinimumWidth(0, 250)
@@ -512,18 +2499,27 @@ class MyApp(QWidget):
         buttonET_select_folder.clicked.connect(self.selectET_input_dir)
         group_layout.addWidget(buttonET_select_folder, 0, 0)
         group_layout.addWidget(self.labelET_select_folder, 0, 1)
+
+        buttonET_select_blob = QPushButton(self._t("btn_select_blob"))
+        buttonET_select_blob.clicked.connect(self.selectET_input_blob)
+        group_layout.addWidget(buttonET_select_blob, 1, 0)
         
         buttonET_output_folder = QPushButton(self._t("btn_output_folder"))
         self.labelET_output_folder = QLabel('Папка не выбрана')
         self.labelET_output_folder.setWordWrap(True)
         buttonET_output_folder.clicked.connect(self.selectET_output_dir)
-        group_layout.addWidget(buttonET_output_folder, 1, 0)
-        group_layout.addWidget(self.labelET_output_folder, 1, 1)
+        group_layout.addWidget(buttonET_output_folder, 2, 0)
+        group_layout.addWidget(self.labelET_output_folder, 2, 1)
 
         buttonET_run = QPushButton(self._t("btn_extract_texts_run"))
         buttonET_run.setStyleSheet("background: #2196F3; color: white; font-weight: bold;")
         buttonET_run.clicked.connect(self.start_processing3)
-        group_layout.addWidget(buttonET_run, 2, 0, 1, 0)
+        group_layout.addWidget(buttonET_run, 3, 0, 1, 0)
+
+        buttonET_index = QPushButton(self._t("btn_id_index_run"))
+        buttonET_index.setStyleSheet("background: #9C27B0; color: white; font-weight: bold;")
+        buttonET_index.clicked.connect(self.start_processing13)
+        group_layout.addWidget(buttonET_index, 4, 0, 1, 0)
         group_box_extr_texts.setLayout(group_layout)
 
         # Создаем QPushButton's в "Запаковка текста"
@@ -546,10 +2542,22 @@ class MyApp(QWidget):
         group_layout.addWidget(buttonPT_output_folder, 1, 0)
         group_layout.addWidget(self.labelPT_output_folder, 1, 1)
 
+        buttonPT_archive = QPushButton(self._t("btn_select_reference"))
+        self.labelPT_archive = QLabel('Файл не выбран')
+        self.labelPT_archive.setWordWrap(True)
+        buttonPT_archive.clicked.connect(self.selectPT_archive_file)
+        group_layout.addWidget(buttonPT_archive, 2, 0)
+        group_layout.addWidget(self.labelPT_archive, 2, 1)
+
         buttonPT_run = QPushButton(self._t("btn_pack_text_run"))
         buttonPT_run.setStyleSheet("background: #4CAF50; color: white; font-weight: bold;")
         buttonPT_run.clicked.connect(self.start_processing4)
-        group_layout.addWidget(buttonPT_run, 2, 0, 1, 0)
+        group_layout.addWidget(buttonPT_run, 3, 0, 1, 0)
+
+        buttonPT_build = QPushButton(self._t("btn_pack_text_archive_run"))
+        buttonPT_build.setStyleSheet("background: #9C27B0; color: white; font-weight: bold;")
+        buttonPT_build.clicked.connect(self.start_processing12)
+        group_layout.addWidget(buttonPT_build, 4, 0, 1, 0)
         group_box_pack_texts.setLayout(group_layout)
 
         # Создаем QPushButton's в "Перевод по ID"
@@ -588,6 +2596,60 @@ class MyApp(QWidget):
         group_layout.addWidget(buttonTR_debug, 4, 0, 1, 0)
 
         group_box_translate.setLayout(group_layout)
+
+        # Создаем QPushButton's в "Инструменты архива"
+        group_layout = QGridLayout()
+        group_layout.setColumnMinimumWidth(0, 250)
+        group_layout.setColumnStretch(0, 0)
+        group_layout.setColumnStretch(1, 1)
+
+        buttonAT_select_file = QPushButton(self._t("btn_select_archive"))
+        self.labelAT_select_file = QLabel('Файл не выбран')
+        self.labelAT_select_file.setWordWrap(True)
+        buttonAT_select_file.clicked.connect(self.selectAT_input_file)
+        group_layout.addWidget(buttonAT_select_file, 0, 0)
+        group_layout.addWidget(self.labelAT_select_file, 0, 1)
+
+        buttonAT_select_new_file = QPushButton(self._t("btn_select_new_archive"))
+        self.labelAT_select_new_file = QLabel('Файл не выбран')
+        self.labelAT_select_new_file.setWordWrap(True)
+        buttonAT_select_new_file.clicked.connect(self.selectAT_new_file)
+        group_layout.addWidget(buttonAT_select_new_file, 1, 0)
+        group_layout.addWidget(self.labelAT_select_new_file, 1, 1)
+
+        buttonAT_output_folder = QPushButton(self._t("btn_output_folder"))
+        self.labelAT_output_folder = QLabel('Папка не выбрана')
+        self.labelAT_output_folder.setWordWrap(True)
+        buttonAT_output_folder.clicked.connect(self.selectAT_output_dir)
+        group_layout.addWidget(buttonAT_output_folder, 2, 0)
+        group_layout.addWidget(self.labelAT_output_folder, 2, 1)
+
+        buttonAT_diff = QPushButton(self._t("btn_diff_run"))
+        buttonAT_diff.setStyleSheet("background: #2196F3; color: white; font-weight: bold;")
+        buttonAT_diff.clicked.connect(self.start_processing7)
+        group_layout.addWidget(buttonAT_diff, 3, 0, 1, 0)
+
+        buttonAT_verify = QPushButton(self._t("btn_verify_run"))
+        buttonAT_verify.setStyleSheet("background: #4CAF50; color: white; font-weight: bold;")
+        buttonAT_verify.clicked.connect(self.start_processing8)
+        group_layout.addWidget(buttonAT_verify, 4, 0, 1, 0)
+
+        buttonAT_catalog = QPushButton(self._t("btn_catalog_run"))
+        buttonAT_catalog.setStyleSheet("background: #2196F3; color: white; font-weight: bold;")
+        buttonAT_catalog.clicked.connect(self.start_processing9)
+        group_layout.addWidget(buttonAT_catalog, 5, 0, 1, 0)
+
+        buttonAT_store = QPushButton(self._t("btn_store_run"))
+        buttonAT_store.setStyleSheet("background: #9C27B0; color: white; font-weight: bold;")
+        buttonAT_store.clicked.connect(self.start_processing10)
+        group_layout.addWidget(buttonAT_store, 6, 0, 1, 0)
+
+        buttonAT_roundtrip = QPushButton(self._t("btn_roundtrip_run"))
+        buttonAT_roundtrip.setStyleSheet("background: #4CAF50; color: white; font-weight: bold;")
+        buttonAT_roundtrip.clicked.connect(self.start_processing11)
+        group_layout.addWidget(buttonAT_roundtrip, 7, 0, 1, 0)
+
+        group_box_tools.setLayout(group_layout)
         
         self.log_box = QTextEdit()
         self.log_box.setReadOnly(True)
@@ -597,16 +2659,20 @@ class MyApp(QWidget):
         main_layout.addWidget(lang_widget, 0, 0, 1, 2)
         # 1: Полная распаковка — на всю ширину
         main_layout.addWidget(group_box_full_extract, 1, 0, 1, 2)
-        # 2: Распаковка файла / Распаковка текста
-        main_layout.addWidget(group_box_extr_files, 2, 0)
-        main_layout.addWidget(group_box_extr_texts, 2, 1)
-        # 3: Запаковка текста / Запаковка файлов
-        main_layout.addWidget(group_box_pack_texts, 3, 0)
-        main_layout.addWidget(group_box_pack_files, 3, 1)
-        # 4: Перевод по ID — на всю ширину
-        main_layout.addWidget(group_box_translate, 4, 0, 1, 2)
-        # 5: Лог — на всю ширину
-        main_layout.addWidget(self.log_box, 5, 0, 1, 2)
+        # 2: Пакетная распаковка — на всю ширину
+        main_layout.addWidget(group_box_batch_extract, 2, 0, 1, 2)
+        # 3: Распаковка файла / Распаковка текста
+        main_layout.addWidget(group_box_extr_files, 3, 0)
+        main_layout.addWidget(group_box_extr_texts, 3, 1)
+        # 4: Запаковка текста / Запаковка файлов
+        main_layout.addWidget(group_box_pack_texts, 4, 0)
+        main_layout.addWidget(group_box_pack_files, 4, 1)
+        # 5: Перевод по ID — на всю ширину
+        main_layout.addWidget(group_box_translate, 5, 0, 1, 2)
+        # 6: Инструменты архива — на всю ширину
+        main_layout.addWidget(group_box_tools, 6, 0, 1, 2)
+        # 7: Лог — на всю ширину
+        main_layout.addWidget(self.log_box, 7, 0, 1, 2)
 
         self.setLayout(main_layout)
 
@@ -624,11 +2690,18 @@ class MyApp(QWidget):
         self.EToutput_dir = None
         self.PFinput_path = None
         self.PFoutput_dir = None
+        self.PFreference_path = None
         self.PTinput_path = None
         self.PToutput_dir = None
+        self.PTarchive_path = None
         self.TRinput_path = None
         self.FEinput_path = None
         self.FEoutput_dir = None
+        self.BEinput_path = None
+        self.BEoutput_dir = None
+        self.ATinput_path = None
+        self.ATnew_path = None
+        self.AToutput_dir = None
 
         # Загружаем сохранённые пути, если есть
         self.load_paths_config()
@@ -661,9 +2734,11 @@ class MyApp(QWidget):
             value = paths.get(key, "").strip()
             if not value:
                 return
+            if is_dir is None and not os.path.exists(value):
+                return
             if is_dir and not os.path.isdir(value):
                 return
-            if not is_dir and not os.path.isfile(value):
+            if is_dir is False and not os.path.isfile(value):
                 return
             setattr(self, attr_name, value)
             if label is not None:
@@ -671,15 +2746,23 @@ class MyApp(QWidget):
 
         _set_path("EFinput_path", self.labelEF_select_file, "EFinput_path", False)
         _set_path("EFoutput_dir", self.labelEF_output_folder, "EFoutput_dir", True)
-        _set_path("ETinput_path", self.labelET_select_folder, "ETinput_path", True)
+        # Папка с .dat или контейнер .blob
+        _set_path("ETinput_path", self.labelET_select_folder, "ETinput_path", None)
         _set_path("EToutput_dir", self.labelET_output_folder, "EToutput_dir", True)
-        _set_path("PFinput_path", self.labelPF_select_folder, "PFinput_path", True)
+        _set_path("PFinput_path", self.labelPF_select_folder, "PFinput_path", None)
         _set_path("PFoutput_dir", self.labelPF_output_folder, "PFoutput_dir", True)
+        _set_path("PFreference_path", self.labelPF_reference, "PFreference_path", False)
         _set_path("PTinput_path", self.labelPT_select_file, "PTinput_path", False)
         _set_path("PToutput_dir", self.labelPT_output_folder, "PToutput_dir", True)
+        _set_path("PTarchive_path", self.labelPT_archive, "PTarchive_path", False)
         _set_path("TRinput_path", self.labelTR_select_file, "TRinput_path", False)
         _set_path("FEinput_path", self.labelFE_select_file, "FEinput_path", False)
         _set_path("FEoutput_dir", self.labelFE_output_folder, "FEoutput_dir", True)
+        _set_path("BEinput_path", self.labelBE_select_folder, "BEinput_path", True)
+        _set_path("BEoutput_dir", self.labelBE_output_folder, "BEoutput_dir", True)
+        _set_path("ATinput_path", self.labelAT_select_file, "ATinput_path", False)
+        _set_path("ATnew_path", self.labelAT_select_new_file, "ATnew_path", False)
+        _set_path("AToutput_dir", self.labelAT_output_folder, "AToutput_dir", True)
 
         # Загрузка настроек (язык интерфейса)
         if "settings" in config:
@@ -706,10 +2789,12 @@ class MyApp(QWidget):
         for key in [
             "EFinput_path", "EFoutput_dir",
             "ETinput_path", "EToutput_dir",
-            "PFinput_path", "PFoutput_dir",
-            "PTinput_path", "PToutput_dir",
+            "PFinput_path", "PFoutput_dir", "PFreference_path",
+            "PTinput_path", "PToutput_dir", "PTarchive_path",
             "TRinput_path",
             "FEinput_path", "FEoutput_dir",
+            "BEinput_path", "BEoutput_dir",
+            "ATinput_path", "ATnew_path", "AToutput_dir",
         ]:
             value = getattr(self, key, None)
             if value:
@@ -768,7 +2853,25 @@ class MyApp(QWidget):
             self.log(f"Для запаковки файла выбрана папка с dat: {folder_path}")
             self.labelPF_select_folder.setText(f"{folder_path}")
             self.save_paths_config()
+
+    # Функция выбора контейнера .blob вместо папки с *.dat для запаковки файла
+    def selectPF_input_blob(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Выберите .blob для запаковки файла", filter='*.blob')
+        if file_path:
+            self.PFinput_path = file_path
+            self.log(f"Для запаковки файла выбран контейнер: {file_path}")
+            self.labelPF_select_folder.setText(f"{file_path}")
+            self.save_paths_config()
             
+    # Функция выбора исходного архива игры: неизменённые блоки копируются из него без пересжатия
+    def selectPF_reference_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Выберите исходный архив игры")
+        if file_path:
+            self.PFreference_path = file_path
+            self.log(f"Для запаковки файла выбран исходный архив: {file_path}")
+            self.labelPF_reference.setText(f"{file_path}")
+            self.save_paths_config()
+
     # Функция открытия папки сохранения для запаковки файла
     def selectPF_output_dir(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Выберите папку сохранения для запаковки файла")
@@ -786,6 +2889,15 @@ class MyApp(QWidget):
             self.log(f"Для распаковки текста выбрана папка с *.dat: {folder_path}")
             self.labelET_select_folder.setText(f"{folder_path}")
             self.save_paths_config()
+
+    # Функция выбора контейнера .blob вместо папки с *.dat для распаковки текста
+    def selectET_input_blob(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Выберите .blob для распаковки текста", filter='*.blob')
+        if file_path:
+            self.ETinput_path = file_path
+            self.log(f"Для распаковки текста выбран контейнер: {file_path}")
+            self.labelET_select_folder.setText(f"{file_path}")
+            self.save_paths_config()
             
     # Функция открытия папки сохранения для распаковки текста
     def selectET_output_dir(self):
@@ -823,6 +2935,15 @@ class MyApp(QWidget):
             self.labelPT_output_folder.setText(f"{folder_path}")
             self.save_paths_config()
 
+    # Функция выбора исходного архива для сборки текста сразу в архив игры
+    def selectPT_archive_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Выберите исходный архив игры")
+        if file_path:
+            self.PTarchive_path = file_path
+            self.log(f"Для запаковки текста выбран исходный архив: {file_path}")
+            self.labelPT_archive.setText(f"{file_path}")
+            self.save_paths_config()
+
     # Функции выбора файла и папки для полной распаковки (файл → data + text)
     def selectFE_input_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Выберите файл для полной распаковки")
@@ -840,6 +2961,48 @@ class MyApp(QWidget):
             self.labelFE_output_folder.setText(f"{folder_path}")
             self.save_paths_config()
 
+    # Функции выбора папки игры и папки сохранения для пакетной распаковки
+    def selectBE_input_dir(self):
+        folder_path = QFileDialog.getExistingDirectory(self, "Выберите папку с установленной игрой")
+        if folder_path:
+            self.BEinput_path = folder_path
+            self.log(f"Для пакетной распаковки выбрана папка игры: {folder_path}")
+            self.labelBE_select_folder.setText(f"{folder_path}")
+            self.save_paths_config()
+
+    def selectBE_output_dir(self):
+        folder_path = QFileDialog.getExistingDirectory(self, "Выберите папку сохранения для пакетной распаковки")
+        if folder_path:
+            self.BEoutput_dir = folder_path
+            self.log(f"Для пакетной распаковки выбрана папка сохранения: {folder_path}")
+            self.labelBE_output_folder.setText(f"{folder_path}")
+            self.save_paths_config()
+
+    # Функции выбора архивов и папки для инструментов архива
+    def selectAT_input_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Выберите архив игры")
+        if file_path:
+            self.ATinput_path = file_path
+            self.log(f"Для инструментов архива выбран файл: {file_path}")
+            self.labelAT_select_file.setText(f"{file_path}")
+            self.save_paths_config()
+
+    def selectAT_new_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Выберите новую версию архива")
+        if file_path:
+            self.ATnew_path = file_path
+            self.log(f"Для сравнения выбрана новая версия архива: {file_path}")
+            self.labelAT_select_new_file.setText(f"{file_path}")
+            self.save_paths_config()
+
+    def selectAT_output_dir(self):
+        folder_path = QFileDialog.getExistingDirectory(self, "Выберите папку сохранения для инструментов архива")
+        if folder_path:
+            self.AToutput_dir = folder_path
+            self.log(f"Для инструментов архива выбрана папка сохранения: {folder_path}")
+            self.labelAT_output_folder.setText(f"{folder_path}")
+            self.save_paths_config()
+
     # Создать CSV ID,OriginalText из TextExtractor.csv
     def export_translation_csv(self):
         if not self.TRinput_path:
@@ -1070,7 +3233,10 @@ class MyApp(QWidget):
             self.log("Пожалуйста, выберите папку сохранения для распаковки файла")
             return
 
-        self.worker = WorkerThread(self.EFinput_path, self.EFoutput_dir, 1)
+        # Только текстовые таблицы: остальные блоки отсеиваются по сигнатуре без полной распаковки
+        magics = {TEXT_MAGIC} if self.checkEF_text_only.isChecked() else None
+        self.worker = WorkerThread(self.EFinput_path, self.EFoutput_dir, 1, workers=DEFAULT_WORKERS, magics=magics,
+                                   manifest=True, blob=self.checkEF_blob.isChecked())
         self.worker.log_signal.connect(self.log)
         self.worker.start()
         
@@ -1083,7 +3249,11 @@ class MyApp(QWidget):
             self.log("Пожалуйста, выберите папку сохранения для запаковки файла")
             return
 
-        self.worker = WorkerThread(self.PFinput_path, self.PFoutput_dir, 2)
+        # Кэш сжатых блоков лежит рядом со скриптом и переживает перезапуски
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pak_cache")
+        self.worker = WorkerThread(self.PFinput_path, self.PFoutput_dir, 2, workers=DEFAULT_WORKERS,
+                                   reference=self.PFreference_path, cache_dir=cache_dir,
+                                   preset=self.comboPF_preset.currentData())
         self.worker.log_signal.connect(self.log)
         self.worker.start()
         
@@ -1096,7 +3266,10 @@ class MyApp(QWidget):
             self.log("Пожалуйста, выберите папку сохранения для распаковки текста")
             return
 
-        self.worker = WorkerThread(self.ETinput_path, self.EToutput_dir, 3)
+        # Кэш разобранных таблиц лежит рядом со скриптом, как и кэш сжатия
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "text_cache")
+        self.worker = WorkerThread(self.ETinput_path, self.EToutput_dir, 3, workers=DEFAULT_WORKERS,
+                                   cache_dir=cache_dir)
         self.worker.log_signal.connect(self.log)
         self.worker.start()
         
@@ -1113,6 +3286,37 @@ class MyApp(QWidget):
         self.worker.log_signal.connect(self.log)
         self.worker.start()
 
+    # Функция запуска построения глобального индекса ID по папке .dat
+    def start_processing13(self):
+        if not self.ETinput_path:
+            self.log("Пожалуйста, выберите папку c *.dat для построения индекса ID")
+            return
+        if not self.EToutput_dir:
+            self.log("Пожалуйста, выберите папку сохранения для индекса ID")
+            return
+
+        self.worker = WorkerThread(self.ETinput_path, self.EToutput_dir, 13)
+        self.worker.log_signal.connect(self.log)
+        self.worker.start()
+
+    # Функция запуска сборки архива игры прямо из CSV и исходного архива (без папки .dat)
+    def start_processing12(self):
+        if not self.PTinput_path:
+            self.log("Пожалуйста, выберите файл CSV для запаковки текста")
+            return
+        if not self.PTarchive_path:
+            self.log("Пожалуйста, выберите исходный архив игры")
+            return
+        if not self.PToutput_dir:
+            self.log("Пожалуйста, выберите папку сохранения для запаковки текста")
+            return
+
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pak_cache")
+        self.worker = WorkerThread(self.PTinput_path, self.PToutput_dir, 12, archive_file=self.PTarchive_path,
+                                   workers=DEFAULT_WORKERS, cache_dir=cache_dir)
+        self.worker.log_signal.connect(self.log)
+        self.worker.start()
+
     # Функция запуска полной распаковки (файл → data + text)
     def start_processing5(self):
         if not self.FEinput_path:
@@ -1122,13 +3326,90 @@ class MyApp(QWidget):
             self.log("Пожалуйста, выберите базовую папку для полной распаковки")
             return
 
-        self.worker = WorkerThread(self.FEinput_path, self.FEoutput_dir, 5)
+        # Текст разбирается прямо из памяти; .dat сохраняются, только если флажок снят
+        write_dat = not self.checkFE_no_dat.isChecked()
+        self.worker = WorkerThread(self.FEinput_path, self.FEoutput_dir, 5, fused=True, write_dat=write_dat,
+                                   workers=DEFAULT_WORKERS, manifest=True)
+        self.worker.log_signal.connect(self.log)
+        self.worker.start()
+
+    # Функция запуска пакетной распаковки (папка игры → все архивы)
+    def start_processing6(self):
+        if not self.BEinput_path:
+            self.log("Пожалуйста, выберите папку игры для пакетной распаковки")
+            return
+        if not self.BEoutput_dir:
+            self.log("Пожалуйста, выберите папку сохранения для пакетной распаковки")
+            return
+
+        self.worker = WorkerThread(self.BEinput_path, self.BEoutput_dir, 6, workers=DEFAULT_WORKERS, manifest=True)
+        self.worker.log_signal.connect(self.log)
+        self.worker.start()
+
+    # Функция запуска сравнения двух версий архива (папка сохранения — по желанию)
+    def start_processing7(self):
+        if not self.ATinput_path:
+            self.log("Пожалуйста, выберите старую версию архива")
+            return
+        if not self.ATnew_path:
+            self.log("Пожалуйста, выберите новую версию архива")
+            return
+
+        self.worker = WorkerThread(self.ATinput_path, self.AToutput_dir, 7, new_file=self.ATnew_path)
+        self.worker.log_signal.connect(self.log)
+        self.worker.start()
+
+    # Функция запуска проверки целостности архива (папка сохранения — только для отчёта)
+    def start_processing8(self):
+        if not self.ATinput_path:
+            self.log("Пожалуйста, выберите архив для проверки")
+            return
+
+        self.worker = WorkerThread(self.ATinput_path, self.AToutput_dir, 8)
+        self.worker.log_signal.connect(self.log)
+        self.worker.start()
+
+    # Функция запуска построения каталога блоков архива
+    def start_processing9(self):
+        if not self.ATinput_path:
+            self.log("Пожалуйста, выберите архив для построения каталога")
+            return
+        if not self.AToutput_dir:
+            self.log("Пожалуйста, выберите папку сохранения для каталога")
+            return
+
+        self.worker = WorkerThread(self.ATinput_path, self.AToutput_dir, 9)
+        self.worker.log_signal.connect(self.log)
+        self.worker.start()
+
+    # Функция запуска распаковки в хранилище блоков (папка сохранения — хранилище)
+    def start_processing10(self):
+        if not self.ATinput_path:
+            self.log("Пожалуйста, выберите архив для распаковки в хранилище")
+            return
+        if not self.AToutput_dir:
+            self.log("Пожалуйста, выберите папку хранилища блоков")
+            return
+
+        self.worker = WorkerThread(self.ATinput_path, self.AToutput_dir, 10, workers=DEFAULT_WORKERS)
+        self.worker.log_signal.connect(self.log)
+        self.worker.start()
+
+    # Функция запуска проверки пересборки (временный архив — в папке сохранения или рядом с исходным)
+    def start_processing11(self):
+        if not self.ATinput_path:
+            self.log("Пожалуйста, выберите архив для проверки пересборки")
+            return
+
+        self.worker = WorkerThread(self.ATinput_path, self.AToutput_dir, 11, workers=DEFAULT_WORKERS)
         self.worker.log_signal.connect(self.log)
         self.worker.start()
 
 
 
 if __name__ == '__main__':
+    # Нужно для пула процессов распаковки текста в собранном .exe
+    freeze_support()
     app = QApplication(sys.argv)
     app_font = QFont("Verdana", 10)
     app.setFont(app_font)